@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""无界面批量转换入口，与图形界面共用 core.command 中的命令构造逻辑
+
+示例：
+    python cli.py --type video --format MKV "/data/in/*.mp4"
+    python cli.py --type music --format MP3 --settings my_music.ini /data/in/*.flac
+    python cli.py --type compress --format MP4 --encoder libx265 --crf 28 lecture.mp4
+"""
+import argparse
+import glob
+import os
+import subprocess
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from core.command import (read_config, resolve_worker_count, output_path_for,
+                          build_ffmpeg_args, build_command, stream_copy_args, fan_out_formats, fan_out_outputs,
+                          PAGE_SETTINGS_FILES, APP_SETTINGS_FILE)
+from core.probe import MediaProbe
+from core.segment import SegmentedEncoder
+from core.fingerprint import compute_fingerprint, is_current, write_fingerprint
+
+# 命令行类型与界面页面索引的对应关系
+TYPE_PAGES = {
+    "video": 1,
+    "music": 2,
+    "image": 3,
+    "compress": 4,
+}
+
+
+def expand_inputs(patterns):
+    """展开输入通配符，保持顺序并去重"""
+    files = []
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if os.path.isfile(path) and path not in seen:
+                seen.add(path)
+                files.append(path)
+    return files
+
+
+def run_ffmpeg(cmd):
+    """运行一个 ffmpeg 进程，返回 (退出码, 最后几行错误输出)"""
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                text=True, errors="replace")
+    except OSError as e:
+        return 127, str(e)
+    tail = deque(maxlen=20)
+    for line in proc.stderr:
+        if line.strip():
+            tail.append(line.rstrip())
+    return proc.wait(), "\n".join(tail)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Open 格式转换 - 无界面批量转换")
+    parser.add_argument("inputs", nargs="+", help="输入文件或通配符（如 \"videos/*.mp4\"）")
+    parser.add_argument("--type", required=True, choices=sorted(TYPE_PAGES), help="转换类型")
+    parser.add_argument("--format", required=True, help="输出格式，如 MP4、MP3、PNG")
+    parser.add_argument("--settings", help="高级配置文件，默认使用 config/ 下对应类型的配置")
+    parser.add_argument("--output-dir", help="输出根目录，默认 ./Open-Format-Conversion")
+    parser.add_argument("--jobs", type=int, default=0, help="并发任务数，默认读取 config/app_settings.ini")
+    parser.add_argument("--incremental", action="store_true",
+                        help="增量转换：输入和参数都未变化、输出已存在时跳过")
+    parser.add_argument("--hash", action="store_true", help="增量转换时额外校验输入文件的部分内容哈希")
+    parser.add_argument("--no-stream-copy", action="store_true", help="禁止自动流复制，总是重新编码")
+    # 视频压缩参数，对应界面中的编码器/CRF/宽度/高度
+    parser.add_argument("--encoder", default="", help="视频压缩编码器（libx264/libx265）")
+    parser.add_argument("--crf", default="", help="视频压缩 CRF 值（0-51）")
+    parser.add_argument("--width", default="", help="视频压缩宽度")
+    parser.add_argument("--height", default="", help="视频压缩高度")
+    parser.add_argument("--segments", type=int, default=0,
+                        help="视频压缩时把每个文件切成 K 段并发编码（分段并行编码）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    page_index = TYPE_PAGES[args.type]
+
+    input_files = expand_inputs(args.inputs)
+    if not input_files:
+        print("没有找到输入文件", file=sys.stderr)
+        return 2
+
+    if page_index == 4:
+        config = {"视频编码": args.encoder, "crf": args.crf, "宽度": args.width, "高度": args.height}
+    else:
+        config = read_config(args.settings or PAGE_SETTINGS_FILES[page_index])
+    try:
+        ffmpeg_args = build_ffmpeg_args(page_index, args.format, config)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    app_config = read_config(APP_SETTINGS_FILE)
+    jobs = args.jobs if args.jobs > 0 else resolve_worker_count(page_index, app_config)
+    # 只有视频页面且没有任何转码参数时才可能走流复制，此时才需要探测输入
+    media_probe = None
+    if page_index == 1 and not ffmpeg_args and not args.no_stream_copy \
+            and app_config.get("自动流复制") != "否":
+        media_probe = MediaProbe()
+    segments = args.segments if page_index == 4 else 0
+    if segments > 1:
+        media_probe = MediaProbe()
+        jobs = 1  # 每个文件的分段已占满所有核心
+        # 与界面相同：时长未知或短于该值的文件不分段，直接整体编码
+        try:
+            segment_min_duration = float(app_config.get("分段最短时长(秒)", "300"))
+        except ValueError:
+            segment_min_duration = 300.0
+
+    # 图片页面优先用 Pillow 在进程内转换，不为每张图片启动 ffmpeg
+    image_engine = page_index == 3 and app_config.get("图片引擎") != "ffmpeg"
+    if image_engine:
+        from core.image_engine import can_convert, convert_image
+    incremental = args.incremental or app_config.get("增量转换") == "是"
+    partial_hash = args.hash or app_config.get("增量校验哈希") == "是"
+
+    # 音频多格式输出时每个文件的参数中带有附加输出的路径
+    fan_out = bool(fan_out_formats(page_index, args.format, config))
+
+    def convert(input_file, output_file):
+        """在线程池中探测并转换单个文件，返回 (退出码, 错误输出, 备注)"""
+        file_args = ffmpeg_args
+        note = ""
+        if fan_out:
+            file_args = build_ffmpeg_args(page_index, args.format, config, input_file, args.output_dir)
+            note = f"（同时输出 {'、'.join(fan_out_formats(page_index, args.format, config))}）"
+        if media_probe and segments <= 1:
+            copy_args = stream_copy_args(page_index, args.format, ffmpeg_args, media_probe.get(input_file))
+            if copy_args:
+                file_args = copy_args
+                note = "（流复制）"
+        fingerprint = None
+        if incremental:
+            fingerprint = compute_fingerprint(input_file, file_args, partial_hash)
+            extra_outputs = fan_out_outputs(input_file, page_index, args.format, config, args.output_dir)
+            if is_current(output_file, fingerprint) and all(map(os.path.exists, extra_outputs)):
+                return 0, "", "（未变化，跳过）"
+        if image_engine and can_convert(input_file, args.format):
+            try:
+                convert_image(input_file, output_file, args.format, config.get("宽度", ""), config.get("高度", ""))
+                if fingerprint:
+                    write_fingerprint(output_file, fingerprint)
+                return 0, "", note
+            except Exception as e:
+                note = f"（Pillow 无法处理，改用 FFmpeg：{e}）"
+        media_info = media_probe.get(input_file) if segments > 1 else None
+        duration = media_info.get("duration") if media_info else None
+        if segments > 1 and duration and duration >= segment_min_duration:
+            encoder = SegmentedEncoder(input_file, output_file, ffmpeg_args, media_info, segments,
+                                       log=lambda text: print(f"  {text}"))
+            note = note or f"（分段并行编码 {segments} 段）"
+            try:
+                encoder.run()
+            except RuntimeError as e:
+                return 1, str(e), ""
+            exit_code, tail = 0, ""
+        else:
+            cmd = build_command(input_file, output_file, file_args, progress=False)
+            exit_code, tail = run_ffmpeg(cmd)
+        if exit_code == 0 and fingerprint:
+            write_fingerprint(output_file, fingerprint)
+        return exit_code, tail, note
+
+    total = len(input_files)
+    failed = 0
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = {}
+            for input_file in input_files:
+                output_file = output_path_for(input_file, args.format, page_index, args.output_dir)
+                futures[executor.submit(convert, input_file, output_file)] = (input_file, output_file)
+            for done, future in enumerate(as_completed(futures), 1):
+                input_file, output_file = futures[future]
+                exit_code, tail, note = future.result()
+                if exit_code == 0:
+                    print(f"[{done}/{total}] 完成{note}: {output_file}")
+                else:
+                    failed += 1
+                    print(f"[{done}/{total}] 失败（退出码 {exit_code}）: {input_file}\n{tail}", file=sys.stderr)
+    finally:
+        if media_probe:
+            media_probe.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""FFmpeg 转换命令构造，图形界面与命令行共用，不依赖 PySide6"""
+import os
+
+# 页面索引与输出目录、配置文件的对应关系
+PAGE_OUTPUT_DIRS = {
+    1: "video",              # 视频页面（page_1）
+    2: "music",              # 音频页面（page_2）
+    3: "image",              # 图片页面（page_3）
+    4: "Video_compression",  # 视频压缩页面（page_4）
+}
+PAGE_SETTINGS_FILES = {
+    1: os.path.join("config", "video_settings.ini"),
+    2: os.path.join("config", "music_settings.ini"),
+    3: os.path.join("config", "image_settings.ini"),
+}
+APP_SETTINGS_FILE = os.path.join("config", "app_settings.ini")
+
+# 各容器可直接封装（无需重新编码）的编码格式，None 表示不限制
+_MP4_CODECS = {
+    "video": {"h264", "hevc", "mpeg4", "av1", "vp9", "mpeg2video"},
+    "audio": {"aac", "mp3", "ac3", "eac3", "alac", "opus", "flac"},
+    "subtitle": {"mov_text"},
+}
+STREAM_COPY_CODECS = {
+    "mp4": _MP4_CODECS,
+    "m4v": _MP4_CODECS,
+    "mov": {
+        "video": {"h264", "hevc", "mpeg4", "prores", "mjpeg", "mpeg2video"},
+        "audio": {"aac", "mp3", "alac", "ac3", "pcm_s16le", "pcm_s24le"},
+        "subtitle": {"mov_text"},
+    },
+    "mkv": {
+        "video": None,
+        "audio": None,
+        "subtitle": {"subrip", "ass", "ssa", "webvtt", "hdmv_pgs_subtitle", "dvd_subtitle"},
+    },
+    "webm": {
+        "video": {"vp8", "vp9", "av1"},
+        "audio": {"vorbis", "opus"},
+        "subtitle": {"webvtt"},
+    },
+    "ts": {
+        "video": {"h264", "hevc", "mpeg2video"},
+        "audio": {"aac", "mp3", "mp2", "ac3", "eac3"},
+        "subtitle": {"dvb_subtitle"},
+    },
+    "flv": {
+        "video": {"h264"},
+        "audio": {"aac", "mp3"},
+        "subtitle": set(),
+    },
+}
+STREAM_COPY_ARGS = ["-c", "copy"]
+
+
+def read_config(config_path):
+    """读取配置文件并解析有效参数"""
+    params = {}
+    if not os.path.exists(config_path):  # 文件不存在
+        return params
+
+    with open(config_path, 'r', encoding='utf-8') as f:
+        for line in f.readlines():
+            line = line.strip()
+            if '=' in line:
+                key, value = line.split('=', 1)
+                key = key.strip()
+                value = value.strip()
+                if value:  # 只保留值非空的配置
+                    params[key] = value
+    return params
+
+
+def default_worker_count(page_index):
+    """根据CPU核心数给出默认并发任务数"""
+    cpu_count = os.cpu_count() or 1
+    if page_index in (1, 4):
+        # 视频编码器本身是多线程的，每个ffmpeg进程按约4个核心估算
+        return max(1, cpu_count // 4)
+    # 音频、图片转换基本是单线程，可按核心数并发
+    return cpu_count
+
+
+def resolve_worker_count(page_index, app_config=None):
+    """读取并发任务数配置，未配置时按CPU核心数自动决定"""
+    if app_config is None:
+        app_config = read_config(APP_SETTINGS_FILE)
+    try:
+        count = int(app_config.get("并发任务数", ""))
+    except ValueError:
+        count = 0
+    if count <= 0:
+        count = default_worker_count(page_index)
+    return count
+
+
+def scale_filter(width, height):
+    """根据宽度/高度生成 scale 滤镜，只给一边时保持宽高比"""
+    if width and height:
+        return f"scale={width}:{height}"
+    elif width:
+        return f"scale={width}:-1"
+    elif height:
+        return f"scale=-1:{height}"
+    return None
+
+
+def output_path_for(input_file, output_format, page_index, base_dir=None):
+    """计算输出文件路径，并创建 Open-Format-Conversion 下的输出目录"""
+    file_name = os.path.basename(input_file).rsplit('.', 1)[0]
+    output_dir = PAGE_OUTPUT_DIRS.get(page_index, "")
+    if not output_dir:
+        return input_file.rsplit('.', 1)[0] + '.' + output_format.lower()
+    if base_dir is None:
+        base_dir = os.path.join(os.getcwd(), "Open-Format-Conversion")
+    full_output_dir = os.path.join(base_dir, output_dir)
+    os.makedirs(full_output_dir, exist_ok=True)
+    return os.path.join(full_output_dir, f"{file_name}.{output_format.lower()}")
+
+
+def fan_out_formats(page_index, output_format, config):
+    """音频页面的多格式输出：多格式输出=AAC,OGG 中与主格式不同的格式，其他页面为空列表"""
+    if page_index != 2:
+        return []
+    formats = []
+    for fmt in config.get("多格式输出", "").replace("，", ",").split(","):
+        fmt = fmt.strip().upper()
+        if fmt and fmt != output_format.upper() and fmt not in formats:
+            formats.append(fmt)
+    return formats
+
+
+def fan_out_outputs(input_file, page_index, output_format, config, base_dir=None):
+    """多格式输出中附加输出文件的路径（不含主格式的输出）"""
+    return [output_path_for(input_file, fmt, page_index, base_dir)
+            for fmt in fan_out_formats(page_index, output_format, config)]
+
+
+def audio_args(output_format, config):
+    """单个音频输出的编码参数，格式专用的配置（如 MP3.比特率(kbps)）优先于通用配置"""
+    def option(key):
+        return config.get(f"{output_format.upper()}.{key}", config.get(key))
+
+    args = []
+    for key, ffmpeg_key in (("采样率(Hz)", "-ar"), ("比特率(kbps)", "-b:a")):
+        if option(key):
+            args.extend([ffmpeg_key, option(key)])
+    if option("音量"):
+        args.extend(["-filter:a", f"volume={option('音量')}"])
+    return args
+
+
+def build_ffmpeg_args(page_index, output_format, config, input_file=None, base_dir=None):
+    """根据页面类型和配置生成输入输出之间的 ffmpeg 参数
+
+    视频压缩页面的 config 由界面控件组成，键名与视频配置相同。
+    音频页面配置了多格式输出且给出 input_file 时，附加输出（各自的参数和路径）排在前面，
+    主格式的参数放在最后，ffmpeg 只解码一次输入。配置值非法时抛出 ValueError。
+    """
+    ffmpeg_args = []
+
+    if page_index == 1:  # 视频页面（page_1）
+        # GIF格式时不添加任何视频参数（直接跳过）
+        if output_format.lower() == "gif":
+            return ffmpeg_args
+
+        # 保留原有参数映射（crf/帧数/编码）
+        param_map = {
+            "crf": "-crf",
+            "视频帧数(fps)": "-r",
+            "视频编码": "-c:v"
+        }
+        for key, ffmpeg_key in param_map.items():
+            if key in config and config[key]:
+                ffmpeg_args.extend([ffmpeg_key, config[key]])
+
+        # 处理视频音量参数
+        volume = config.get("音量", "").strip()
+        if volume:
+            try:
+                float(volume)
+            except ValueError:
+                raise ValueError("音量值需为有效数字（如1.25）！")
+            ffmpeg_args.extend(["-filter:a", f"volume={volume}"])
+
+        # 处理宽度/高度自适应
+        scale = scale_filter(config.get("宽度", "").strip(), config.get("高度", "").strip())
+        if scale:
+            ffmpeg_args.extend(["-vf", scale])
+
+    elif page_index == 2:  # 音频页面（page_2）
+        if input_file:
+            for fmt, path in zip(fan_out_formats(page_index, output_format, config),
+                                 fan_out_outputs(input_file, page_index, output_format, config, base_dir)):
+                ffmpeg_args.extend(audio_args(fmt, config))
+                ffmpeg_args.append(path)
+        ffmpeg_args.extend(audio_args(output_format, config))
+
+    elif page_index == 3:  # 图片页面（page_3）
+        scale = scale_filter(config.get("宽度", ""), config.get("高度", ""))
+        if scale:
+            ffmpeg_args.extend(["-vf", scale])
+
+    elif page_index == 4:  # 视频压缩页面（page_4）
+        # 1. 处理编码器
+        encoder = config.get("视频编码", "")
+        if encoder and encoder != "默认":
+            ffmpeg_args.extend(["-c:v", encoder])
+
+        # 2. 处理CRF值
+        crf = config.get("crf", "").strip()
+        if crf:
+            ffmpeg_args.extend(["-crf", crf])
+
+        # 3. 处理宽度和高度
+        scale = scale_filter(config.get("宽度", "").strip(), config.get("高度", "").strip())
+        if scale:
+            ffmpeg_args.extend(["-vf", scale])
+
+    return ffmpeg_args
+
+
+def can_stream_copy(output_format, media_info):
+    """判断输入的所有音视频/字幕流是否都能原样封装进目标容器"""
+    allowed = STREAM_COPY_CODECS.get(output_format.lower())
+    if not allowed or not media_info:
+        return False
+    has_video = False
+    for stream in media_info.get("streams", []):
+        codec_type = stream.get("codec_type")
+        if codec_type not in allowed:
+            continue  # 数据流、附件等默认不会被 ffmpeg 选中
+        codecs = allowed[codec_type]
+        if codecs is not None and stream.get("codec_name") not in codecs:
+            return False
+        if codec_type == "video":
+            has_video = True
+    return has_video
+
+
+def stream_copy_args(page_index, output_format, ffmpeg_args, media_info):
+    """视频页面没有任何转码参数且编码兼容时，返回流复制参数，否则返回 None"""
+    if page_index != 1 or ffmpeg_args:
+        return None
+    if can_stream_copy(output_format, media_info):
+        return list(STREAM_COPY_ARGS)
+    return None
+
+
+def build_command(input_file, output_file, ffmpeg_args, progress=True):
+    """构造完整的 ffmpeg 参数列表（不经过 shell）"""
+    cmd = ["ffmpeg", "-y"]
+    if progress:
+        cmd.extend(["-progress", "pipe:1", "-nostats"])
+    cmd.extend(["-i", input_file])
+    cmd.extend(ffmpeg_args)
+    cmd.append(output_file)
+    return cmd
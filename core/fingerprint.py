@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""增量转换：根据输入文件和最终 ffmpeg 参数生成指纹，输出未过期时跳过转换"""
+import hashlib
+import json
+import os
+
+FINGERPRINT_SUFFIX = ".ofc-fingerprint"
+PARTIAL_HASH_BYTES = 1024 * 1024  # 部分哈希读取文件开头和结尾各 1 MiB
+
+
+def fingerprint_path(output_file):
+    """指纹保存在输出文件旁边的隐藏文件中"""
+    directory, name = os.path.split(output_file)
+    return os.path.join(directory, f".{name}{FINGERPRINT_SUFFIX}")
+
+
+def _partial_hash(path, size):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        digest.update(f.read(PARTIAL_HASH_BYTES))
+        if size > PARTIAL_HASH_BYTES * 2:
+            f.seek(size - PARTIAL_HASH_BYTES)
+        digest.update(f.read(PARTIAL_HASH_BYTES))
+    return digest.hexdigest()
+
+
+def compute_fingerprint(input_file, ffmpeg_args, partial_hash=False):
+    """由输入文件的大小、修改时间（可选部分内容哈希）和参数列表计算指纹"""
+    st = os.stat(input_file)
+    data = {
+        "input": os.path.abspath(input_file),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "args": list(ffmpeg_args),
+    }
+    if partial_hash:
+        data["partial_hash"] = _partial_hash(input_file, st.st_size)
+    encoded = json.dumps(data, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def is_current(output_file, fingerprint):
+    """输出文件存在、未被改动且指纹一致时返回 True"""
+    try:
+        st = os.stat(output_file)
+        with open(fingerprint_path(output_file), 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (saved.get("fingerprint") == fingerprint
+            and saved.get("output_size") == st.st_size
+            and saved.get("output_mtime_ns") == st.st_mtime_ns)
+
+
+def write_fingerprint(output_file, fingerprint):
+    """转换成功后记录指纹和输出文件状态"""
+    try:
+        st = os.stat(output_file)
+        with open(fingerprint_path(output_file), 'w', encoding='utf-8') as f:
+            json.dump({
+                "fingerprint": fingerprint,
+                "output_size": st.st_size,
+                "output_mtime_ns": st.st_mtime_ns,
+            }, f)
+    except OSError:
+        pass
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""图片页面的进程内转换引擎：用 Pillow 直接解码、缩放、编码，不为每张图片启动 ffmpeg
+
+界面与命令行共用，不依赖 PySide6。Pillow 不能读取的输入（如 HEIC、SVG）或不能写出的格式
+由调用方退回 ffmpeg。
+"""
+import os
+
+import numpy as np
+from PIL import Image
+
+# 图片页面的输出格式与 Pillow 格式名的对应关系
+PILLOW_FORMATS = {
+    "JPG": "JPEG",
+    "JPEG": "JPEG",
+    "PNG": "PNG",
+    "WEBP": "WEBP",
+    "BMP": "BMP",
+    "TIFF": "TIFF",
+    "ICO": "ICO",
+}
+# 各格式可以直接保存的颜色模式，其他模式先转换
+SAVE_MODES = {
+    "JPEG": ("L", "RGB", "CMYK"),
+    "PNG": ("1", "L", "LA", "P", "RGB", "RGBA", "I", "I;16"),
+    "WEBP": ("RGB", "RGBA"),
+    "BMP": ("1", "L", "P", "RGB", "RGBA"),
+    "TIFF": ("1", "L", "LA", "P", "RGB", "RGBA", "CMYK", "I;16"),
+    "ICO": ("RGBA",),
+}
+# 大幅缩小时先用 JPEG 的 DCT 缩放（draft）或整数倍 reduce 缩到目标尺寸的这一倍数以上，
+# 再做双三次重采样，与 Image.thumbnail 的默认值相同，画质与直接缩放几乎没有差别
+REDUCING_GAP = 2.0
+# Image.reduce 不支持的 16 位/32 位整数模式，缩放时不做整数倍预缩小，保留原位深
+NO_REDUCE_MODES = ("I", "I;16", "I;16B", "I;16L", "I;16N")
+SAVE_OPTIONS = {
+    "JPEG": {"quality": 90},
+    "WEBP": {"quality": 90},
+}
+
+
+def pillow_format(output_format):
+    """返回 Pillow 能写出的格式名，不支持时返回 None"""
+    name = PILLOW_FORMATS.get(output_format.upper())
+    Image.init()
+    return name if name in Image.SAVE else None
+
+
+def can_convert(input_file, output_format):
+    """按扩展名判断能否用 Pillow 转换，不打开文件"""
+    Image.init()
+    ext = os.path.splitext(input_file)[1].lower()
+    return ext in Image.registered_extensions() and pillow_format(output_format) is not None
+
+
+def _dimension(value):
+    try:
+        value = int(str(value).strip())
+    except ValueError:
+        return 0
+    return max(value, 0)
+
+
+def target_size(size, width="", height=""):
+    """与 scale_filter 相同：宽高都给出时拉伸到该尺寸，只给一边时保持宽高比，都没有时返回 None"""
+    width, height = _dimension(width), _dimension(height)
+    src_w, src_h = size
+    if width and height:
+        return width, height
+    if width:
+        return width, max(1, round(src_h * width / src_w))
+    if height:
+        return max(1, round(src_w * height / src_h)), height
+    return None
+
+
+def _convert_mode(img, format_name):
+    if img.mode in SAVE_MODES[format_name]:
+        return img
+    if img.mode in ("I;16", "I;16B", "I"):
+        # 16 位灰度按高 8 位缩放到 8 位，直接 convert 会把大于 255 的值截断
+        img = Image.fromarray((np.asarray(img, dtype=np.uint32) >> 8).clip(0, 255).astype(np.uint8))
+        if img.mode in SAVE_MODES[format_name]:
+            return img
+    if format_name == "JPEG":
+        return img.convert("RGB")  # 与 ffmpeg 一致，JPG 不保留透明通道
+    has_alpha = img.mode in ("RGBA", "LA", "PA", "RGBa", "La") or "transparency" in img.info
+    return img.convert("RGBA" if has_alpha or format_name == "ICO" else "RGB")
+
+
+def convert_image(input_file, output_file, output_format, width="", height=""):
+    """用 Pillow 转换一张图片（多帧图片只取第一帧），失败时抛出异常，调用方可退回 ffmpeg"""
+    format_name = pillow_format(output_format)
+    if format_name is None:
+        raise ValueError(f"Pillow 不支持输出 {output_format}")
+    with Image.open(input_file) as img:
+        size = target_size(img.size, width, height)
+        if size and size[0] < img.width and size[1] < img.height:
+            # JPEG 解码时直接按 1/2、1/4、1/8 缩小，不解码全分辨率图像
+            img.draft(None, (int(size[0] * REDUCING_GAP), int(size[1] * REDUCING_GAP)))
+        img.load()
+        if size and size != img.size:
+            if img.mode in ("1", "P"):
+                img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+            # ffmpeg scale 滤镜默认也是双三次插值；reducing_gap 先用 reduce 做整数倍缩小
+            reducing_gap = None if img.mode in NO_REDUCE_MODES else REDUCING_GAP
+            img = img.resize(size, Image.BICUBIC, reducing_gap=reducing_gap)
+        img = _convert_mode(img, format_name)
+        options = dict(SAVE_OPTIONS.get(format_name, {}))
+        if format_name == "ICO":
+            # 只写入一个与图片相同的尺寸（图标最大 256x256），默认会生成一组较小的尺寸
+            options["sizes"] = [(min(img.width, 256), min(img.height, 256))]
+        img.save(output_file, format=format_name, **options)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""持久化的批量任务队列，保存在 config/jobs.db，程序崩溃或终止后可以继续"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+JOBS_DB = os.path.join("config", "jobs.db")
+
+# 任务状态
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# 批次状态
+BATCH_ACTIVE = "active"
+BATCH_FINISHED = "finished"
+BATCH_CANCELLED = "cancelled"
+
+MAX_ATTEMPTS = 3  # 恢复批次时失败任务的最大重试次数
+
+
+class JobStore:
+    """批次和任务的 SQLite 存储，每个任务记录输入、输出、最终参数、状态和尝试次数"""
+
+    def __init__(self, db_path=JOBS_DB):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS batches ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, page_index INTEGER, output_format TEXT, "
+                "config TEXT, state TEXT, created REAL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, batch_id INTEGER, seq INTEGER, "
+                "input TEXT, output TEXT, args TEXT, state TEXT, attempts INTEGER DEFAULT 0, "
+                "updated REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch_id, seq)")
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def create_batch(self, page_index, output_format, config, pairs):
+        """新建批次，pairs 为 (输入, 输出) 列表，返回批次 id
+
+        同一时间只保留一个可继续的批次，之前未完成的批次视为放弃。
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE batches SET state = ? WHERE state = ?",
+                               (BATCH_CANCELLED, BATCH_ACTIVE))
+            cursor = self._conn.execute(
+                "INSERT INTO batches (page_index, output_format, config, state, created) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (page_index, output_format, json.dumps(config, ensure_ascii=False), BATCH_ACTIVE, now)
+            )
+            batch_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO jobs (batch_id, seq, input, output, state, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                [(batch_id, seq, src, dst, PENDING, now) for seq, (src, dst) in enumerate(pairs)]
+            )
+        return batch_id
+
+    def active_batch(self):
+        """返回最近一个未完成的批次，没有时返回 None"""
+        rows = self._query(
+            "SELECT * FROM batches WHERE state = ? ORDER BY id DESC LIMIT 1", (BATCH_ACTIVE,)
+        )
+        if not rows:
+            return None
+        batch = rows[0]
+        batch["config"] = json.loads(batch["config"] or "{}")
+        return batch
+
+    def jobs(self, batch_id, states=None):
+        sql = "SELECT * FROM jobs WHERE batch_id = ?"
+        params = [batch_id]
+        if states:
+            sql += " AND state IN (%s)" % ",".join("?" * len(states))
+            params.extend(states)
+        rows = self._query(sql + " ORDER BY seq", params)
+        for row in rows:
+            row["args"] = json.loads(row["args"]) if row["args"] else None
+        return rows
+
+    def count(self, batch_id, state):
+        rows = self._query("SELECT COUNT(*) AS n FROM jobs WHERE batch_id = ? AND state = ?",
+                           (batch_id, state))
+        return rows[0]["n"]
+
+    def mark_running(self, job_id, args):
+        """记录最终使用的 ffmpeg 参数，并增加一次尝试次数"""
+        self._execute(
+            "UPDATE jobs SET state = ?, args = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+            (RUNNING, json.dumps(args, ensure_ascii=False), time.time(), job_id)
+        )
+
+    def set_state(self, job_id, state):
+        self._execute("UPDATE jobs SET state = ?, updated = ? WHERE id = ?", (state, time.time(), job_id))
+
+    def finish_batch(self, batch_id, state=BATCH_FINISHED):
+        self._execute("UPDATE batches SET state = ? WHERE id = ?", (state, batch_id))
+
+    def recover(self, batch_id, extra_outputs=None):
+        """恢复中断的批次：删除运行中任务留下的不完整输出，并把可重试的任务重置为待处理
+
+        extra_outputs(job) 返回同一任务的其他输出文件（如多格式输出），一并删除。
+        """
+        for job in self.jobs(batch_id, [RUNNING]):
+            remove_partial_output(job["output"])
+            for path in (extra_outputs(job) if extra_outputs else []):
+                remove_partial_output(path)
+            self.set_state(job["id"], PENDING)
+        self._execute(
+            "UPDATE jobs SET state = ? WHERE batch_id = ? AND state = ? AND attempts < ?",
+            (PENDING, batch_id, FAILED, MAX_ATTEMPTS)
+        )
+        return self.jobs(batch_id, [PENDING])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def remove_partial_output(path):
+    """删除中断的任务写了一半的输出文件"""
+    try:
+        if path and os.path.exists(path):
+            os.remove(path)
+    except OSError:
+        pass
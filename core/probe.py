@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""基于 ffprobe 的媒体信息探测，结果按 路径+大小+修改时间 缓存到 config/probe_cache.db"""
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+
+PROBE_DB = os.path.join("config", "probe_cache.db")
+
+# 只保留后续构造命令会用到的流信息字段
+STREAM_FIELDS = ("index", "codec_type", "codec_name", "profile", "pix_fmt", "width", "height",
+                 "r_frame_rate", "sample_rate", "channels", "channel_layout")
+
+
+def run_ffprobe(path):
+    """运行 ffprobe 并整理出时长、容器和流信息，失败时返回 None"""
+    cmd = ["ffprobe", "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, errors="replace", check=True)
+        data = json.loads(result.stdout)
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+    fmt = data.get("format", {})
+    try:
+        duration = float(fmt.get("duration"))
+    except (TypeError, ValueError):
+        duration = None
+    streams = []
+    for stream in data.get("streams", []):
+        streams.append({key: stream[key] for key in STREAM_FIELDS if key in stream})
+    return {
+        "duration": duration,
+        "format_name": fmt.get("format_name", ""),
+        "bit_rate": fmt.get("bit_rate"),
+        "streams": streams,
+    }
+
+
+class MediaProbe:
+    """带持久化缓存的媒体探测器，可在多个线程中共用"""
+
+    def __init__(self, db_path=PROBE_DB):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS probes ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, data TEXT)"
+            )
+
+    def lookup(self, path):
+        """只查缓存，不运行 ffprobe；未命中或文件已变化时返回 None"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, data FROM probes WHERE path = ?", (os.path.abspath(path),)
+            ).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return json.loads(row[2])
+        return None
+
+    def get(self, path):
+        """获取媒体信息，缓存失效时重新探测"""
+        info = self.lookup(path)
+        if info is not None:
+            return info
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        info = run_ffprobe(path)
+        if info is None:
+            return None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO probes (path, size, mtime_ns, data) VALUES (?, ?, ?, ?)",
+                (os.path.abspath(path), st.st_size, st.st_mtime_ns, json.dumps(info))
+            )
+        return info
+
+    def close(self):
+        """关闭缓存数据库，程序退出时调用"""
+        with self._lock:
+            self._conn.close()
+
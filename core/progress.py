@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""解析 ffmpeg `-progress pipe:1` 输出的 key=value 进度流"""
+import re
+from collections import namedtuple
+
+# out_time_ms 单位为毫秒，total_size 单位为字节，percent 在无法得知总时长时为 None
+FFmpegProgress = namedtuple(
+    "FFmpegProgress",
+    ["out_time_ms", "fps", "speed", "total_size", "percent", "done"]
+)
+
+DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+def parse_duration(text):
+    """从 ffmpeg 的输入信息中解析时长（秒），找不到时返回 None"""
+    match = DURATION_RE.search(text)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def _to_float(value):
+    try:
+        return float(value.rstrip("x"))
+    except (AttributeError, ValueError):
+        return None
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ProgressParser:
+    """逐块喂入 ffmpeg 进度输出，每遇到一个 progress= 行就产出一条 FFmpegProgress"""
+
+    def __init__(self, duration=None):
+        self.duration = duration  # 输入总时长（秒）
+        self._buffer = ""
+        self._fields = {}
+
+    def feed(self, data):
+        self._buffer += data
+        lines = self._buffer.split("\n")
+        self._buffer = lines.pop()  # 最后一段可能不完整，留待下次
+        results = []
+        for line in lines:
+            key, sep, value = line.strip().partition("=")
+            if not sep:
+                continue
+            if key == "progress":
+                results.append(self._build(value == "end"))
+                self._fields = {}
+            else:
+                self._fields[key] = value
+        return results
+
+    def _build(self, done):
+        fields = self._fields
+        # 历史原因 ffmpeg 的 out_time_ms 实际单位是微秒，新版本另有 out_time_us
+        out_time_us = _to_int(fields.get("out_time_us"))
+        if out_time_us is None:
+            out_time_us = _to_int(fields.get("out_time_ms"))
+        out_time_ms = out_time_us // 1000 if out_time_us is not None else None
+
+        percent = None
+        if done:
+            percent = 100.0
+        elif self.duration and out_time_ms is not None:
+            percent = max(0.0, min(100.0, out_time_ms / 10.0 / self.duration))
+
+        return FFmpegProgress(
+            out_time_ms=out_time_ms,
+            fps=_to_float(fields.get("fps")),
+            speed=_to_float(fields.get("speed")),
+            total_size=_to_int(fields.get("total_size")),
+            percent=percent,
+            done=done,
+        )
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""长视频分段并行编码：按关键帧切分、并发编码、concat 无损拼接并校验时长"""
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from core.command import STREAM_COPY_CODECS
+from core.probe import run_ffprobe
+from core.progress import FFmpegProgress, ProgressParser
+
+# 拼接后时长允许的误差：固定 0.5 秒再加总时长的 0.2%
+DURATION_TOLERANCE = 0.5
+DURATION_TOLERANCE_RATIO = 0.002
+
+
+def default_segment_count():
+    """默认分段数：每段约占两个核心，至少 2 段，最多 16 段"""
+    return max(2, min(16, (os.cpu_count() or 2) // 2))
+
+
+class SegmentedEncoder:
+    """把一个输入文件切成 K 段并发编码，再拼接成 output_file
+
+    log(text) 和 progress(FFmpegProgress) 回调会在工作线程中调用。
+    """
+
+    def __init__(self, input_file, output_file, ffmpeg_args, media_info, segments,
+                 log=None, progress=None):
+        self.input_file = input_file
+        self.output_file = output_file
+        self.ffmpeg_args = list(ffmpeg_args)
+        self.media_info = media_info or {}
+        self.duration = self.media_info.get("duration")
+        self.segments = max(1, segments)
+        self.log = log or (lambda text: None)
+        self.progress = progress or (lambda p: None)
+        self._stop_event = threading.Event()
+        self._processes = []
+        self._lock = threading.Lock()
+        self._segment_done = {}  # 分段序号 -> 已编码时长（毫秒）
+
+    def stop(self):
+        """终止所有正在运行的 ffmpeg 进程"""
+        self._stop_event.set()
+        with self._lock:
+            processes = list(self._processes)
+        for proc in processes:
+            if proc.poll() is None:
+                proc.terminate()
+
+    def run(self):
+        if not self.duration:
+            raise RuntimeError("无法获取视频时长，不能分段编码")
+        output_dir = os.path.dirname(os.path.abspath(self.output_file))
+        # 临时目录放在输出目录下，保证拼接时与输出在同一文件系统
+        work_dir = tempfile.mkdtemp(prefix=".ofc-segments-", dir=output_dir)
+        try:
+            sources = self._split(work_dir)
+            encoded = self._encode_all(sources, work_dir)
+            self._concat(encoded, work_dir)
+            self._verify()
+        except Exception:
+            # 不留下不完整或未通过校验的输出
+            if os.path.exists(self.output_file):
+                os.remove(self.output_file)
+            raise
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        self.progress(FFmpegProgress(int(self.duration * 1000), None, None, None, 100.0, True))
+
+    def _run(self, cmd, parser=None, on_progress=None):
+        """运行一个 ffmpeg 进程，失败或被终止时抛出 RuntimeError"""
+        if self._stop_event.is_set():
+            raise RuntimeError("已终止")
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE if parser else subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, text=True, errors="replace")
+        with self._lock:
+            self._processes.append(proc)
+        tail = deque(maxlen=20)
+        stderr_reader = threading.Thread(
+            target=lambda: tail.extend(line.rstrip() for line in proc.stderr if line.strip()),
+            daemon=True
+        )
+        stderr_reader.start()
+        if parser:
+            for line in proc.stdout:
+                for item in parser.feed(line):
+                    on_progress(item)
+        proc.wait()
+        stderr_reader.join()
+        with self._lock:
+            self._processes.remove(proc)
+        if self._stop_event.is_set():
+            raise RuntimeError("已终止")
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg 退出码 {proc.returncode}:\n" + "\n".join(tail))
+
+    def _split(self, work_dir):
+        """只复制视频流，按关键帧切成约 K 段"""
+        segment_time = self.duration / self.segments
+        self.log(f"按关键帧切分为约 {self.segments} 段（每段约 {segment_time:.1f} 秒）")
+        pattern = os.path.join(work_dir, "src_%03d.mkv")
+        self._run([
+            "ffmpeg", "-y", "-nostats", "-i", self.input_file,
+            "-map", "0:v:0", "-c", "copy",
+            "-f", "segment", "-segment_time", f"{segment_time:.3f}", "-reset_timestamps", "1",
+            pattern
+        ])
+        sources = sorted(
+            os.path.join(work_dir, name) for name in os.listdir(work_dir) if name.startswith("src_")
+        )
+        if not sources:
+            raise RuntimeError("切分视频失败")
+        return sources
+
+    def _encode_all(self, sources, work_dir):
+        """并发编码所有分段，每个 ffmpeg 分到大致相同的线程数"""
+        threads = max(1, (os.cpu_count() or 1) // len(sources))
+        encoded = [os.path.join(work_dir, f"enc_{i:03d}.mkv") for i in range(len(sources))]
+        self.log(f"开始并发编码 {len(sources)} 个分段")
+        with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+            futures = [
+                executor.submit(self._encode_one, i, src, dst, threads)
+                for i, (src, dst) in enumerate(zip(sources, encoded))
+            ]
+            try:
+                for future in futures:
+                    future.result()
+            except Exception:
+                self.stop()
+                raise
+        return encoded
+
+    def _encode_one(self, index, source, target, threads):
+        cmd = ["ffmpeg", "-y", "-progress", "pipe:1", "-nostats", "-i", source]
+        cmd.extend(self.ffmpeg_args)
+        cmd.extend(["-an", "-threads", str(threads), target])
+
+        def on_progress(item):
+            if item.out_time_ms is not None:
+                with self._lock:
+                    self._segment_done[index] = item.out_time_ms
+                    done_ms = sum(self._segment_done.values())
+                # 编码阶段占整体进度的 95%，拼接和校验占剩余部分
+                percent = min(95.0, done_ms / 10.0 / self.duration * 0.95)
+                self.progress(FFmpegProgress(done_ms, item.fps, item.speed, None, percent, False))
+
+        self._run(cmd, ProgressParser(), on_progress)
+
+    def _audio_codec_args(self):
+        """音频能直接放入目标容器时复制，否则交给容器默认的音频编码器"""
+        ext = os.path.splitext(self.output_file)[1].lstrip(".").lower()
+        allowed = STREAM_COPY_CODECS.get(ext, {}).get("audio", set())
+        for stream in self.media_info.get("streams", []):
+            if stream.get("codec_type") != "audio":
+                continue
+            if allowed is not None and stream.get("codec_name") not in allowed:
+                return []
+        return ["-c:a", "copy"]
+
+    def _concat(self, encoded, work_dir):
+        """用 concat 分离器无损拼接视频分段，并混入原始音频"""
+        list_path = os.path.join(work_dir, "list.txt")
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for path in encoded:
+                escaped = path.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        self.log("拼接分段并混入音频")
+        cmd = [
+            "ffmpeg", "-y", "-nostats",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-i", self.input_file,
+            "-map", "0:v", "-map", "1:a?", "-c:v", "copy",
+        ]
+        cmd.extend(self._audio_codec_args())
+        cmd.append(self.output_file)
+        self._run(cmd)
+
+    def _verify(self):
+        """校验拼接结果的总时长与输入一致"""
+        info = run_ffprobe(self.output_file)
+        output_duration = info.get("duration") if info else None
+        if output_duration is None:
+            raise RuntimeError("无法读取拼接结果的时长")
+        tolerance = DURATION_TOLERANCE + self.duration * DURATION_TOLERANCE_RATIO
+        if abs(output_duration - self.duration) > tolerance:
+            raise RuntimeError(
+                f"拼接结果时长 {output_duration:.2f} 秒与输入 {self.duration:.2f} 秒不一致"
+            )
+        self.log(f"时长校验通过（{output_duration:.2f} 秒）")
@@ -1,10 +1,16 @@
 # -*- coding: utf-8 -*-
+import time
+STARTUP_BEGIN = time.perf_counter()  # 启动耗时报告的计时起点
 import os
 # 指定为xcb
 os.environ['QT_QPA_PLATFORM'] = 'xcb'
+import multiprocessing
 import subprocess
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from PySide6.QtWidgets import QMainWindow, QApplication, QWidget, QFileDialog, QAbstractItemView, QHeaderView, QTableWidgetItem, QMessageBox
-from PySide6.QtCore import QProcess, QObject, Signal
+from PySide6.QtCore import QProcess, QObject, Signal, QTimer
 from page.home_ui import Ui_MainWindow
 import sys
 # 导入对应的 UI 类
@@ -12,16 +18,25 @@ from page.video import Ui_Form as VideoUiForm
 from page.music import Ui_Form as MusicUiForm
 from page.image import Ui_Form as ImageUiForm
 from page.output_ui import Ui_Form as OutputUiForm
-from page.koutu import PhotoIDTool  # 导入抠图窗口类
+from page.log_view import LogSink
 from PySide6.QtGui import QIntValidator
 from PySide6.QtCore import QRegularExpression
 from PySide6.QtGui import QRegularExpressionValidator
+from core.progress import ProgressParser, parse_duration
+from core.probe import MediaProbe
+from core.segment import SegmentedEncoder, default_segment_count
+from core.fingerprint import compute_fingerprint, is_current, write_fingerprint
+from core.jobs import JobStore, remove_partial_output, PENDING, DONE, FAILED, BATCH_CANCELLED
+from core.command import (read_config, resolve_worker_count, output_path_for,
+                          build_ffmpeg_args, build_command, fan_out_formats, fan_out_outputs, PAGE_OUTPUT_DIRS,
+                          PAGE_SETTINGS_FILES, APP_SETTINGS_FILE, stream_copy_args)
 
 class OutputWorker(QObject):
     log_signal = Signal(str)
-    finished_signal = Signal()
+    progress_signal = Signal(object)  # 传递 FFmpegProgress
+    finished_signal = Signal(object)  # 传递完成的 worker 本身
 
-    def __init__(self, input_file, output_file, page_index):
+    def __init__(self, input_file, output_file, page_index, verbose=False):
         super().__init__()
         self.input_file = input_file
         self.output_file = output_file
@@ -29,35 +44,217 @@ class OutputWorker(QObject):
         self.process.readyReadStandardOutput.connect(self.handle_stdout)
         self.process.readyReadStandardError.connect(self.handle_stderr)
         self.process.finished.connect(self.handle_finished)
-        self.cmd = None
+        self.process.errorOccurred.connect(self.handle_error)
+        self.cmd = None  # ffmpeg 参数列表，由 build_command 生成
         self.page_index = page_index  # 保存页面索引
+        self.verbose = verbose  # 是否转发原始日志
+        self.exit_code = None
+        self.job_id = None  # 对应任务库中的任务
+        self.fingerprint = None  # 增量转换指纹，成功后写到输出旁边
+        self.progress_parser = ProgressParser()
+        self.stderr_tail = deque(maxlen=20)  # 只保留最后几行，用于失败时提示
+        self._stderr_head = ""  # 未解析到时长前的输出
+        self.log_path = None  # 设置后将完整日志写入该文件
+        self._log_file = None
 
     def start(self):
-        # 使用自定义命令替代原固定模板
-        if self.cmd:
-            self.process.start("sh", ["-c", self.cmd])  # Linux/macOS
-        else:
-            # 保留原逻辑作为备用
-            cmd = f'ffmpeg -y -i "{self.input_file}" "{self.output_file}"'
-            self.process.start("sh", ["-c", cmd])
+        # 直接启动 ffmpeg，不经过 shell，避免文件名中的特殊字符被解析
+        cmd = self.cmd or build_command(self.input_file, self.output_file, [])
+        if self.log_path:
+            self._log_file = open(self.log_path, 'w', encoding='utf-8')
+            self._log_file.write(" ".join(cmd) + "\n")
+        self.process.start(cmd[0], cmd[1:])
 
     def handle_stdout(self):
-        data = self.process.readAllStandardOutput().data().decode()
-        self.log_signal.emit(data)
+        # stdout 为 -progress pipe:1 输出的 key=value 进度流
+        data = self.process.readAllStandardOutput().data().decode(errors="replace")
+        for progress in self.progress_parser.feed(data):
+            self.progress_signal.emit(progress)
 
     def handle_stderr(self):
-        data = self.process.readAllStandardError().data().decode()
-        self.log_signal.emit(data)
-
-    def handle_finished(self):
-        self.finished_signal.emit()
+        data = self.process.readAllStandardError().data().decode(errors="replace")
+        if self.progress_parser.duration is None and self._stderr_head is not None:
+            self._stderr_head += data
+            duration = parse_duration(self._stderr_head)
+            if duration:
+                self.progress_parser.duration = duration
+                self._stderr_head = None
+            elif len(self._stderr_head) > 65536:
+                self._stderr_head = None  # 输入信息里没有时长，放弃解析
+        self.stderr_tail.extend(line for line in data.splitlines() if line.strip())
+        if self._log_file:
+            self._log_file.write(data)
+        if self.verbose:
+            self.log_signal.emit(data)
+
+    def handle_finished(self, exit_code=0, exit_status=None):
+        self.exit_code = exit_code
+        self.close_log()
+        self.finished_signal.emit(self)
+
+    def handle_error(self, error):
+        """ffmpeg 无法启动（如不在 PATH 中）时不会触发 finished，按失败结束任务以释放任务槽"""
+        if error != QProcess.FailedToStart:
+            return
+        self.exit_code = 127
+        self.stderr_tail.append(f"无法启动 ffmpeg: {self.process.errorString()}")
+        self.close_log()
+        # start() 中可能同步触发，延迟到事件循环再通知，避免在分派任务的过程中重入
+        QTimer.singleShot(0, lambda: self.finished_signal.emit(self))
+
+    def close_log(self):
+        if self._log_file:
+            self._log_file.close()
+            self._log_file = None
+
+    def request_stop(self):
+        self.process.terminate()
 
     def stop(self):
         self.process.terminate()
         if not self.process.waitForFinished(3000):
             self.process.kill()
+        self.close_log()
+
+
+class SegmentWorker(QObject):
+    """分段并行编码任务，接口与 OutputWorker 一致，编码流程在后台线程中执行"""
+    log_signal = Signal(str)
+    progress_signal = Signal(object)
+    finished_signal = Signal(object)
+    _done_signal = Signal()  # 从后台线程切回主线程
+
+    def __init__(self, input_file, output_file, page_index, ffmpeg_args, media_info, segments, verbose=False):
+        super().__init__()
+        self.input_file = input_file
+        self.output_file = output_file
+        self.page_index = page_index
+        self.verbose = verbose
+        self.exit_code = None
+        self.job_id = None
+        self.fingerprint = None
+        self.stderr_tail = deque(maxlen=20)
+        self.log_path = None
+        self.encoder = SegmentedEncoder(
+            input_file, output_file, ffmpeg_args, media_info, segments,
+            log=self.log_signal.emit, progress=self.progress_signal.emit
+        )
+        self._thread = None
+        self._done_signal.connect(self.handle_finished)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self.encoder.run()
+            self.exit_code = 0
+        except Exception as e:
+            self.stderr_tail.extend(str(e).splitlines())
+            self.exit_code = 1
+        self._done_signal.emit()
+
+    def handle_finished(self):
+        self.finished_signal.emit(self)
+
+    def request_stop(self):
+        self.encoder.stop()
+
+    def stop(self):
+        self.encoder.stop()
+        if self._thread:
+            self._thread.join(5)
+
+class ImageWorker(QObject):
+    """图片页面的进程内转换任务，接口与 OutputWorker 一致
+
+    在线程池中用 Pillow 解码、缩放、编码；Pillow 无法处理时在同一线程中改用 ffmpeg。
+    """
+    log_signal = Signal(str)
+    progress_signal = Signal(object)
+    finished_signal = Signal(object)
+    _done_signal = Signal()  # 从线程池切回主线程
+
+    def __init__(self, input_file, output_file, page_index, output_format, config, cmd, executor, verbose=False):
+        super().__init__()
+        self.input_file = input_file
+        self.output_file = output_file
+        self.page_index = page_index
+        self.output_format = output_format
+        self.config = config
+        self.cmd = cmd  # Pillow 失败时使用的 ffmpeg 参数列表
+        self.executor = executor
+        self.verbose = verbose
+        self.exit_code = None
+        self.job_id = None
+        self.fingerprint = None
+        self.stderr_tail = deque(maxlen=20)
+        self.log_path = None
+        self._future = None
+        self._process = None
+        self._stopped = False
+        self._done_signal.connect(self.handle_finished)
+
+    def start(self):
+        self._future = self.executor.submit(self._run)
+
+    def _run(self):
+        from core.image_engine import convert_image
+        try:
+            convert_image(self.input_file, self.output_file, self.output_format,
+                          self.config.get("宽度", ""), self.config.get("高度", ""))
+            self.exit_code = 0
+        except Exception as e:
+            self.log_signal.emit(f"Pillow 无法处理，改用 FFmpeg: {self.input_file}（{e}）")
+            self.exit_code = self._run_ffmpeg()
+        self._done_signal.emit()
+
+    def _run_ffmpeg(self):
+        if self._stopped:
+            return 1
+        log_file = open(self.log_path, 'w', encoding='utf-8') if self.log_path else None
+        try:
+            self._process = subprocess.Popen(self.cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                             text=True, errors="replace")
+            if log_file:
+                log_file.write(" ".join(self.cmd) + "\n")
+            for line in self._process.stderr:
+                if log_file:
+                    log_file.write(line)
+                if line.strip():
+                    self.stderr_tail.append(line.rstrip())
+            return self._process.wait()
+        except OSError as e:
+            self.stderr_tail.append(str(e))
+            return 1
+        finally:
+            if log_file:
+                log_file.close()
+
+    def handle_finished(self):
+        self.finished_signal.emit(self)
+
+    def request_stop(self):
+        self._stopped = True
+        if self._future:
+            self._future.cancel()
+        if self._process and self._process.poll() is None:
+            self._process.terminate()
+
+    def stop(self):
+        self.request_stop()
+        # 等正在写入的转换结束，调用方随后删除不完整的输出
+        if self._future and not self._future.cancelled():
+            try:
+                self._future.result(timeout=30)
+            except Exception:
+                pass
+
 
 class MainWindow(QMainWindow):
+    probe_ready = Signal(object, object)  # (任务, 探测 Future)，后台探测完成后切回主线程
+
     def __init__(self):
         super(MainWindow, self).__init__()
         self.ui = Ui_MainWindow()
@@ -123,7 +320,30 @@ class MainWindow(QMainWindow):
         # 默认显示首页
         self.show_home_page()
         self.output_window = None
-        self.output_worker = None
+        self.output_ui = None
+        self.log_sink = None
+        self.log_dir = None  # 保存完整日志的目录，未开启时为 None
+        self.stream_copy_enabled = True  # 编码兼容时自动使用 -c copy
+        self.incremental = False  # 输入和参数都未变化时跳过转换
+        self.incremental_hash = False
+        self.segment_count = 0  # 分段并行编码的段数，0 表示不分段
+        self.segment_min_duration = 300.0
+        self.active_workers = []  # 正在运行的 OutputWorker
+        self.file_queue = []  # 当前批次待处理的任务
+        self.current_file_index = 0  # 下一个待分派任务的索引
+        self.finished_count = 0  # 已完成的文件数
+        self.batch_total = 0
+        self.batch_id = None
+        self.batch_config = {}
+        self.job_store = None  # 持久化任务库，首次使用时打开
+        self.job_percent = {}  # 运行中任务的完成百分比
+        self.media_probe = None  # 首次转换时再打开探测缓存
+        self.probe_executor = ThreadPoolExecutor(max_workers=4)
+        self.probe_futures = {}  # 输入文件 -> 探测结果 Future
+        self.probing = {}  # 等待探测结果的任务（任务 id -> 任务），各占一个任务槽
+        self.probe_ready.connect(self.start_probed_job)
+        self.image_engine = True  # 图片页面优先用 Pillow 在进程内转换
+        self.image_executor = None  # 进程内图片转换的线程池，图片批次开始时创建
 
         # 允许的文件扩展名
         self.allowed_exts_video = [
@@ -142,6 +362,9 @@ class MainWindow(QMainWindow):
             "heif", "avif"
         ]
 
+        # 窗口显示后检查是否有中断的批次
+        QTimer.singleShot(0, self.check_unfinished_batch)
+
     def show_home_page(self):
         self.ui.stackedWidget.setCurrentIndex(0)  # 显示page(首页)
 
@@ -292,24 +515,15 @@ class MainWindow(QMainWindow):
 
     def read_config(self, config_path):
         """读取配置文件并解析有效参数"""
-        params = {}
-        if not os.path.exists(config_path):  # 文件不存在
-            return params
+        return read_config(config_path)
 
-        with open(config_path, 'r', encoding='utf-8') as f:
-            for line in f.readlines():
-                line = line.strip()
-                if '=' in line:
-                    key, value = line.split('=', 1)
-                    key = key.strip()
-                    value = value.strip()
-                    if value:  # 只保留值非空的配置
-                        params[key] = value
-        return params
+    def get_max_workers(self, page_index):
+        """读取并发任务数配置，未配置时按CPU核心数自动决定"""
+        return resolve_worker_count(page_index)
 
     def execute_ffmpeg(self):
         # 检查是否有正在运行的任务
-        if self.output_worker is not None and self.output_worker.process.state() == QProcess.Running:
+        if self.active_workers:
             QMessageBox.warning(self, "警告", "当前有任务正在运行，请等待完成后再尝试！")
             return
 
@@ -320,199 +534,340 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "警告", "请选择输出格式并添加输入文件！")
             return
 
-        self.file_queue = input_files  # 填充文件队列
+        page_index = self.ui.stackedWidget.currentIndex()
+        if page_index == 4:  # 视频压缩页面（page_4）的参数来自界面控件
+            config = {
+                "视频编码": self.ui.comboBox_5.currentText(),
+                "crf": self.ui.lineEdit.text().strip(),
+                "宽度": self.ui.lineEdit_1.text().strip(),
+                "高度": self.ui.lineEdit_2.text().strip(),
+                "分段并行编码": "是" if self.ui.checkBox.isChecked() else "否",
+            }
+        else:
+            config = self.read_config(PAGE_SETTINGS_FILES.get(page_index, ""))
+        try:
+            build_ffmpeg_args(page_index, output_format, config)  # 提前校验配置
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            return
+
+        # 批次写入任务库，崩溃或终止后可以从断点继续
+        job_store = self.get_job_store()
+        pairs = [(path, output_path_for(path, output_format, page_index)) for path in input_files]
+        batch_id = job_store.create_batch(page_index, output_format, config, pairs)
+        self.start_batch(batch_id, page_index, output_format, config, job_store.jobs(batch_id))
+
+    def get_job_store(self):
+        if self.job_store is None:
+            self.job_store = JobStore()
+        return self.job_store
+
+    def check_unfinished_batch(self):
+        """启动时检查上次未完成的批次，询问是否继续"""
+        job_store = self.get_job_store()
+        batch = job_store.active_batch()
+        if not batch:
+            return
+        total = len(job_store.jobs(batch["id"]))
+        done = job_store.count(batch["id"], DONE)
+        reply = QMessageBox.question(
+            self, "提示", f"检测到上次未完成的批量转换（已完成 {done}/{total}），是否继续？",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply != QMessageBox.Yes:
+            job_store.finish_batch(batch["id"], BATCH_CANCELLED)
+            return
+        # 清理中断时写了一半的输出，已完成的文件直接跳过
+        jobs = job_store.recover(batch["id"], lambda job: fan_out_outputs(
+            job["input"], batch["page_index"], batch["output_format"], batch["config"]))
+        if not jobs:
+            job_store.finish_batch(batch["id"])
+            return
+        self.start_batch(batch["id"], batch["page_index"], batch["output_format"], batch["config"],
+                         jobs, total - len(jobs))
+
+    def start_batch(self, batch_id, page_index, output_format, config, jobs, done_count=0):
+        """开始（或继续）执行一个批次中待处理的任务"""
+        self.batch_id = batch_id
+        self.batch_config = config
+        self.file_queue = jobs  # 填充任务队列
         self.current_file_index = 0  # 重置当前索引
+        self.finished_count = done_count
+        self.batch_total = done_count + len(jobs)
+        self.job_percent = {}
         self.current_output_format = output_format  # 保存当前输出格式
-        self.current_page_index = self.ui.stackedWidget.currentIndex()  # 保存当前页面索引
-        self.process_next_file()  # 修改：不传递参数，使用实例变量
+        self.current_page_index = page_index  # 保存当前页面索引
+        self.max_workers = self.get_max_workers(page_index)
+
+        app_config = self.read_config(APP_SETTINGS_FILE)
+        # 视频压缩页面可选分段并行编码，每个文件已占满所有核心，因此逐个文件处理
+        self.segment_count = 0
+        if page_index == 4 and config.get("分段并行编码") == "是":
+            try:
+                self.segment_count = int(app_config.get("分段数", "0"))
+            except ValueError:
+                self.segment_count = 0
+            if self.segment_count <= 0:
+                self.segment_count = default_segment_count()
+            try:
+                self.segment_min_duration = float(app_config.get("分段最短时长(秒)", "300"))
+            except ValueError:
+                self.segment_min_duration = 300.0
+            self.max_workers = 1
+        try:
+            max_lines = int(app_config.get("日志最大行数", "2000"))
+        except ValueError:
+            max_lines = 2000
+        self.stream_copy_enabled = app_config.get("自动流复制") != "否"
+        self.image_engine = page_index == 3 and app_config.get("图片引擎") != "ffmpeg"
+        if self.image_engine:
+            if self.image_executor:
+                self.image_executor.shutdown(wait=False)
+            self.image_executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.incremental = app_config.get("增量转换") == "是"
+        self.incremental_hash = app_config.get("增量校验哈希") == "是"
+        self.log_dir = None
+        if app_config.get("保存完整日志") == "是":
+            self.log_dir = os.path.join(os.getcwd(), "Open-Format-Conversion", "logs")
+            os.makedirs(self.log_dir, exist_ok=True)
+
+        # 在后台提前探测整个批次的输入文件，分派任务时通常已有结果
+        if self.media_probe is None:
+            self.media_probe = MediaProbe()
+        self.probe_futures = {job["input"]: self.probe_executor.submit(self.media_probe.get, job["input"])
+                              for job in jobs if not job["args"] and not self.use_image_engine(job["input"])}
+
+        # 整个批次共用一个输出窗口
+        self.output_window = QWidget()
+        self.output_ui = OutputUiForm()
+        self.output_ui.setupUi(self.output_window)
+        self.apply_ui_color(self.output_window)
+        self.log_sink = LogSink(self.output_ui.textEdit, max(max_lines, 1), parent=self.output_window)
+        self.output_ui.pushButton.clicked.connect(self.stop_ffmpeg)
+        self.output_ui.checkBox.toggled.connect(self.set_verbose_log)
+        self.output_window.closeEvent = self.close_output_window
+        self.output_window.show()
+        if done_count:
+            self.update_log(f"继续上次的批次，跳过已完成的 {done_count} 个文件")
+        extra_formats = fan_out_formats(page_index, output_format, config)
+        if extra_formats:
+            self.update_log(f"多格式输出：每个文件解码一次，同时输出 {'、'.join([output_format.upper(), *extra_formats])}")
+        self.refresh_batch_progress()
+
+        self.fill_worker_slots()
+
+    def fill_worker_slots(self):
+        """用队列中的任务填满空闲的任务槽"""
+        while len(self.active_workers) + len(self.probing) < self.max_workers \
+                and self.current_file_index < len(self.file_queue):
+            self.process_next_file()
+        if not self.active_workers and not self.probing and self.current_file_index >= len(self.file_queue):
+            self.batch_finished()
 
     def process_next_file(self):
-        if self.current_file_index >= len(self.file_queue):
-            # 所有文件处理完成
-            QMessageBox.information(self, "提示", "所有文件执行已完成！")
+        """分派队列中的下一个任务，探测结果未就绪时先占住任务槽，不在界面线程中等待"""
+        job = self.file_queue[self.current_file_index]
+        self.current_file_index += 1
+        if self.use_image_engine(job["input"]):
+            # Pillow 转换不需要时长等探测信息，不再为每张图片启动 ffprobe
+            self.start_job(job, None)
             return
+        future = self.probe_future(job["input"])
+        if future.done():
+            self.start_job(job, self.probe_result(future))
+            return
+        self.probing[job["id"]] = job
+        future.add_done_callback(lambda f, job=job: self.probe_ready.emit(job, f))
 
-        input_file = self.file_queue[self.current_file_index]
-        file_name = os.path.basename(input_file).rsplit('.', 1)[0]
+    def start_probed_job(self, job, future):
+        """探测完成（在主线程中），启动等待中的任务；探测被取消或批次已终止时忽略"""
+        if future.cancelled() or self.probing.pop(job["id"], None) is None:
+            return
+        self.start_job(job, self.probe_result(future))
+        self.fill_worker_slots()
 
+    def start_job(self, job, media_info):
+        """按探测信息构造命令并启动任务"""
+        input_file = job["input"]
+        output_file = job["output"]
         current_index = self.current_page_index  # 使用保存的页面索引
         output_format = self.current_output_format
 
-        # 根据当前页面确定输出目录
-        if current_index == 1:  # 视频页面（page_1）
-            output_dir = "video"
-        elif current_index == 2:  # 音频页面（page_2）
-            output_dir = "music"
-        elif current_index == 3:  # 图片页面（page_3）
-            output_dir = "image"
-        elif current_index == 4:  # 视频压缩页面（page_4）
-            output_dir = "Video_compression"
+        # 中断时已经在运行的任务沿用当时记录的参数
+        ffmpeg_args = job["args"]
+        use_image_engine = self.use_image_engine(input_file)
+        if ffmpeg_args is None:
+            ffmpeg_args = build_ffmpeg_args(current_index, output_format, self.batch_config, input_file)
+            copy_args = None
+            if self.stream_copy_enabled:
+                copy_args = stream_copy_args(current_index, output_format, ffmpeg_args, media_info)
+            if copy_args:
+                # 只是更换容器，直接复制音视频流，不重新编码
+                ffmpeg_args = copy_args
+                self.update_log(f"编码与目标容器兼容，使用流复制（-c copy）: {input_file}")
+        cmd = build_command(input_file, output_file, ffmpeg_args)
+
+        fingerprint = None
+        if self.incremental:
+            try:
+                fingerprint = compute_fingerprint(input_file, ffmpeg_args, self.incremental_hash)
+            except OSError:
+                fingerprint = None
+            extra_outputs = fan_out_outputs(input_file, current_index, output_format, self.batch_config)
+            if fingerprint and is_current(output_file, fingerprint) and all(map(os.path.exists, extra_outputs)):
+                # 输出已是最新，不再转换
+                self.job_store.set_state(job["id"], DONE)
+                self.finished_count += 1
+                self.update_log(f"未变化，跳过: {input_file}")
+                self.refresh_batch_progress()
+                return
+        self.job_store.mark_running(job["id"], ffmpeg_args)
+
+        verbose = self.output_ui.checkBox.isChecked() if self.output_ui else False
+        duration = media_info.get("duration") if media_info else None
+        if use_image_engine:
+            worker = ImageWorker(input_file, output_file, current_index, output_format, self.batch_config,
+                                 cmd, self.image_executor, verbose)
+        elif self.segment_count > 1 and duration and duration >= self.segment_min_duration:
+            worker = SegmentWorker(input_file, output_file, current_index, ffmpeg_args,
+                                   media_info, self.segment_count, verbose)
+            self.update_log(f"分段并行编码（{self.segment_count} 段）: {input_file}")
         else:
-            output_dir = ""
-
-        # 创建 Open-Format-Conversion 目录下的输出目录（如果不存在）
-        if output_dir:
-            full_output_dir = os.path.join(os.getcwd(), "Open-Format-Conversion", output_dir)
-            os.makedirs(full_output_dir, exist_ok=True)
-            output_file = os.path.join(full_output_dir, f"{file_name}.{output_format.lower()}")
-        else:
-            output_file = input_file.rsplit('.', 1)[0] + '.' + output_format.lower()
-
-        ffmpeg_args = []
-
-        if current_index == 1:  # 视频页面（page_1）
-            # 判断是否为GIF格式
-            is_gif = output_format.lower() == "gif"
-            config = self.read_config("config/video_settings.ini")
-
-            if not is_gif:  # 非GIF格式时添加配置参数
-                # 保留原有参数映射（crf/帧数/编码）
-                param_map = {
-                    "crf": "-crf",
-                    "视频帧数(fps)": "-r",
-                    "视频编码": "-c:v"
-                }
-                # 处理视频参数
-                for key, ffmpeg_key in param_map.items():
-                    if key in config and config[key]:
-                        ffmpeg_args.extend([ffmpeg_key, config[key]])
-
-                # 处理视频音量参数
-                volume = config.get("音量", "").strip()
-                if volume:
-                    try:
-                        float(volume)
-                        ffmpeg_args.append(f"-filter:a volume={volume}")
-                    except ValueError:
-                        QMessageBox.warning(self, "警告", "音量值需为有效数字（如1.25）！")
-                        return
-
-                # 处理宽度/高度自适应
-                width = config.get("宽度", "").strip()
-                height = config.get("高度", "").strip()
-                if width or height:
-                    if width and height:
-                        scale = f"scale={width}:{height}"
-                    elif width:
-                        scale = f"scale={width}:-1"
-                    else:
-                        scale = f"scale=-1:{height}"
-                    ffmpeg_args.extend(["-vf", scale])
-
-            # GIF格式时不添加任何视频参数（直接跳过）
-
-        elif current_index == 2:
-            config = self.read_config("config/music_settings.ini")
-            param_map = {
-                "采样率(Hz)": "-ar",
-                "比特率(kbps)": "-b:a",
-                "音量": "-filter:a volume="
-            }
-            # 处理音频参数
-            for key, ffmpeg_key in param_map.items():
-                if key in config:
-                    if key == "音量":
-                        ffmpeg_args.append(f"{ffmpeg_key}{config[key]}")
-                    else:
-                        ffmpeg_args.extend([ffmpeg_key, config[key]])
-
-        elif current_index == 3:
-            config = self.read_config("config/image_settings.ini")
-            # 处理图片参数
-            width = config.get("宽度", "")
-            height = config.get("高度", "")
-            if width and height:
-                ffmpeg_args.extend(["-vf", f"scale={width}:{height}"])
-            elif width:
-                ffmpeg_args.extend(["-vf", f"scale={width}:-1"])  # 保持宽高比
-            elif height:
-                ffmpeg_args.extend(["-vf", f"scale=-1:{height}"])  # 保持宽高比
-
-        elif current_index == 4:  # 视频压缩页面（page_4）
-            # 1. 处理编码器
-            encoder = self.ui.comboBox_5.currentText()
-            if encoder and encoder != "默认":
-                ffmpeg_args.extend(["-c:v", encoder])
-
-            # 2. 处理CRF值
-            crf = self.ui.lineEdit.text().strip()
-            if crf:
-                ffmpeg_args.extend(["-crf", crf])
-
-            # 3. 处理宽度和高度
-            width = self.ui.lineEdit_1.text().strip()
-            height = self.ui.lineEdit_2.text().strip()
-            if width or height:
-                if width and height:
-                    scale = f"scale={width}:{height}"
-                elif width:
-                    scale = f"scale={width}:-1"
-                else:
-                    scale = f"scale=-1:{height}"
-                ffmpeg_args.extend(["-vf", scale])
-
-        # 构造最终FFmpeg命令
-        cmd_parts = ["ffmpeg", "-y", "-i", f'"{input_file}"']
-        cmd_parts.extend(ffmpeg_args)
-        cmd_parts.append(f'"{output_file}"')
-        cmd = " ".join(cmd_parts)
-
-        self.output_window = QWidget()
-        self.output_ui = OutputUiForm()
-        self.output_ui.setupUi(self.output_window)
-        self.apply_ui_color(self.output_window)  
-        self.output_window.show()
-
-        self.output_worker = OutputWorker(input_file, output_file, current_index)  # 传递页面索引
-        self.output_worker.cmd = cmd
-        self.output_worker.log_signal.connect(self.update_log)
-        self.output_worker.finished_signal.connect(self.output_finished)
-        self.output_ui.pushButton.clicked.connect(self.stop_ffmpeg)
-        self.output_window.closeEvent = self.close_output_window
-
-        self.output_worker.start()
+            worker = OutputWorker(input_file, output_file, current_index, verbose)  # 传递页面索引
+            worker.cmd = cmd
+            if duration:
+                worker.progress_parser.duration = duration
+        worker.job_id = job["id"]
+        worker.fingerprint = fingerprint
+        if self.log_dir:
+            worker.log_path = os.path.join(self.log_dir, os.path.basename(output_file) + ".log")
+        worker.log_signal.connect(self.update_log)
+        worker.progress_signal.connect(lambda progress, w=worker: self.update_progress(w, progress))
+        worker.finished_signal.connect(self.output_finished)
+        self.active_workers.append(worker)
+        self.job_percent[worker] = 0.0
+        self.update_log(f"开始: {input_file}")
+        worker.start()
+
+    def use_image_engine(self, input_file):
+        """图片页面的输入和输出格式都是 Pillow 支持的格式时在进程内转换"""
+        if not self.image_engine:
+            return False
+        from core.image_engine import can_convert
+        return can_convert(input_file, self.current_output_format)
+
+    def probe_future(self, input_file):
+        """取得输入文件的后台探测任务，批次开始时没有提交的（如继续中断的任务）现在提交"""
+        future = self.probe_futures.get(input_file)
+        if future is None:
+            future = self.probe_executor.submit(self.media_probe.get, input_file)
+            self.probe_futures[input_file] = future
+        return future
+
+    def probe_result(self, future):
+        """已完成的探测结果，探测失败或被取消时为 None"""
+        try:
+            return future.result()
+        except Exception:
+            return None
 
     def update_log(self, log):
-        self.output_ui.textEdit.append(log)
+        if self.log_sink:
+            self.log_sink.append(log)
+
+    def set_verbose_log(self, checked):
+        """按需开启原始 ffmpeg 日志"""
+        for worker in self.active_workers:
+            worker.verbose = checked
+
+    def update_progress(self, worker, progress):
+        if progress.percent is not None:
+            self.job_percent[worker] = progress.percent
+        self.refresh_batch_progress()
+
+    def refresh_batch_progress(self):
+        """按已完成文件数和运行中任务的百分比计算整体进度"""
+        if not self.output_ui or not self.batch_total:
+            return
+        total = self.batch_total
+        percent = (self.finished_count * 100 + sum(self.job_percent.values())) / total
+        self.output_ui.progressBar.setFormat(f"{self.finished_count}/{total}  %p%")
+        self.output_ui.progressBar.setValue(int(percent))
 
     def stop_ffmpeg(self):
-        if self.output_worker:
-            self.output_worker.stop()
+        # 放弃尚未开始的文件，并终止所有正在运行的任务；批次保留在任务库中，下次启动可继续
+        self.file_queue = []
+        self.current_file_index = 0
+        # 取消 future 会在当前线程立即执行回调，先清空等待探测的任务，回调中的任务不会再启动
+        self.probing = {}
+        for future in self.probe_futures.values():
+            future.cancel()
+        self.probe_futures = {}
+        workers, self.active_workers = self.active_workers, []
+        self.job_percent = {}
+        for worker in workers:
+            worker.finished_signal.disconnect(self.output_finished)
+            worker.request_stop()  # 先统一发送终止信号，再逐个等待
+        for worker in workers:
+            worker.stop()
+            self.remove_partial_outputs(worker)
+            self.job_store.set_state(worker.job_id, PENDING)
+        self.close_batch_window()
+
+    def remove_partial_outputs(self, worker):
+        """删除失败或终止的任务写了一半的输出，包括多格式输出的附加文件"""
+        remove_partial_output(worker.output_file)
+        for path in fan_out_outputs(worker.input_file, worker.page_index, self.current_output_format,
+                                    self.batch_config):
+            remove_partial_output(path)
+
+    def close_batch_window(self):
+        """关闭批次输出窗口并停止日志刷新"""
+        if self.log_sink:
+            self.log_sink.stop()
+            self.log_sink = None
         if self.output_window:
-            self.output_window.close()
-
-    def output_finished(self):
-        if self.output_window:
-            self.output_window.close()
-        self.current_file_index += 1
-        if self.current_file_index >= len(self.file_queue):
-            # 所有文件处理完成
-            QMessageBox.information(self, "提示", "所有文件执行已完成！")
-            # 使用 OutputWorker 中保存的页面索引
-            current_index = self.output_worker.page_index
-            if current_index == 1:  # 视频页面（page_1）
-                output_dir = "video"
-            elif current_index == 2:  # 音频页面（page_2）
-                output_dir = "music"
-            elif current_index == 3:  # 图片页面（page_3）
-                output_dir = "image"
-            elif current_index == 4:  # 视频压缩页面（page_4）
-                output_dir = "Video_compression"
-            else:
-                output_dir = ""
-
-            if output_dir:
-                full_output_dir = os.path.join(os.getcwd(), "Open-Format-Conversion", output_dir)
-                try:
-                    # 使用 subprocess 模块打开目录
-                    subprocess.run(['xdg-open', full_output_dir], check=True)
-                except subprocess.CalledProcessError as e:
-                    QMessageBox.warning(self, "警告", f"无法打开输出目录: {e}")
-            return
-        self.process_next_file()
+            window = self.output_window
+            self.output_window = None
+            window.close()
+
+    def output_finished(self, worker):
+        if worker in self.active_workers:
+            self.active_workers.remove(worker)
+        self.job_percent.pop(worker, None)
+        self.finished_count += 1
+        if worker.exit_code == 0:
+            self.job_store.set_state(worker.job_id, DONE)
+            if worker.fingerprint:
+                write_fingerprint(worker.output_file, worker.fingerprint)
+            self.update_log(f"完成: {worker.output_file}")
+        else:
+            self.job_store.set_state(worker.job_id, FAILED)
+            self.remove_partial_outputs(worker)
+            self.update_log(f"失败（退出码 {worker.exit_code}）: {worker.input_file}")
+            if not worker.verbose:
+                self.update_log("\n".join(worker.stderr_tail))
+        self.refresh_batch_progress()
+        # 空出的任务槽立即从队列中补充
+        self.fill_worker_slots()
+
+    def batch_finished(self):
+        """批次内所有文件处理完成"""
+        self.close_batch_window()
+        self.job_store.finish_batch(self.batch_id)
+        QMessageBox.information(self, "提示", "所有文件执行已完成！")
+        output_dir = PAGE_OUTPUT_DIRS.get(self.current_page_index, "")
+        if output_dir:
+            full_output_dir = os.path.join(os.getcwd(), "Open-Format-Conversion", output_dir)
+            try:
+                # 使用 subprocess 模块打开目录
+                subprocess.run(['xdg-open', full_output_dir], check=True)
+            except subprocess.CalledProcessError as e:
+                QMessageBox.warning(self, "警告", f"无法打开输出目录: {e}")
 
     def close_output_window(self, event):
-        self.stop_ffmpeg()
+        if self.output_window:
+            self.stop_ffmpeg()
         event.accept()
 
     def validate_line_edit(self, text):
@@ -567,12 +922,40 @@ class MainWindow(QMainWindow):
         if color:
             widget.setStyleSheet(f"background-color: rgb({color});")
     # 打开抠图窗口
+    def closeEvent(self, event):
+        """退出时取消尚未开始的探测并关闭探测缓存数据库"""
+        # 取消探测会立即触发回调，先断开信号，避免退出时还为等待探测的任务启动 ffmpeg
+        self.probe_ready.disconnect(self.start_probed_job)
+        self.probing = {}
+        self.probe_executor.shutdown(wait=False, cancel_futures=True)
+        if self.media_probe:
+            self.media_probe.close()
+            self.media_probe = None
+        super().closeEvent(event)
+
     def open_koutu_window(self):
-        self.koutu_window = PhotoIDTool()
+        # 抠图依赖 numpy、Pillow 和 onnxruntime，第一次打开抠图窗口时才导入，不拖慢主窗口启动
+        from page.koutu import PhotoIDTool
+        self.koutu_window = PhotoIDTool()  # 窗口打开后在后台加载并预热模型
         self.koutu_window.show()
 
+
+def report_startup(imports_done):
+    """输出启动耗时；环境变量 OFC_STARTUP_REPORT=exit 时报告后直接退出，供 tools/bench_startup.py 使用"""
+    now = time.perf_counter()
+    print(f"启动耗时：导入模块 {(imports_done - STARTUP_BEGIN) * 1000:.0f} ms，"
+          f"首个窗口 {(now - STARTUP_BEGIN) * 1000:.0f} ms", file=sys.stderr, flush=True)
+    if os.environ.get("OFC_STARTUP_REPORT") == "exit":
+        QApplication.quit()
+
+
 if __name__ == "__main__":
+    # 打包后的程序中，一键抠图的批量工作进程从这里进入
+    multiprocessing.freeze_support()
+    imports_done = time.perf_counter()
     app = QApplication(sys.argv)
+    # 在恢复批次等提示之前触发，此时主窗口已经显示
+    QTimer.singleShot(0, lambda: report_startup(imports_done))
     window = MainWindow()
     window.show()
     sys.exit(app.exec())
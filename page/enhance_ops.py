@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""一键清晰（Real-ESRGAN）：realesrgan-ncnn-vulkan 批量调用和 onnxruntime CPU 分块推理，不依赖 PySide6"""
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from PIL import Image
+
+from page.png_stream import PngStripWriter
+
+POLL_INTERVAL = 0.2  # 轮询输出目录统计进度的间隔（秒）
+DEFAULT_TILE = 192  # CPU 推理的分块边长（输入像素）
+DEFAULT_TILE_OVERLAP = 16  # 分块向四周多取的像素，重叠部分线性过渡以消除接缝
+
+
+def enhance_batch_ncnn(exe_path, paths, output_dir, progress=None, started=None, extra_args=()):
+    """只启动一次 realesrgan-ncnn-vulkan 处理整批图片，模型加载和 Vulkan 初始化只做一次
+
+    输入以编号命名硬链接（或复制）到临时目录，结果以 <原文件名>.png 移动到 output_dir。
+    progress(已完成数, 总数) 根据输出目录中已生成的文件数回调；started(proc) 在进程启动后回调，
+    以便调用方终止。返回 {输入路径: 错误信息}，按编号把 realesrgan 的错误输出归到对应图片。
+    """
+    progress = progress or (lambda done, total: None)
+    errors = {}
+    work_dir = tempfile.mkdtemp(prefix="ofc-enhance-")
+    in_dir = os.path.join(work_dir, "in")
+    out_dir = os.path.join(work_dir, "out")
+    os.makedirs(in_dir)
+    os.makedirs(out_dir)
+    try:
+        names = {}  # 临时文件名主干 -> 原始路径
+        links = {}  # 临时文件名主干 -> 临时目录中的链接，错误信息中替换回原始路径
+        for i, path in enumerate(paths):
+            stem = f"{i:06d}"
+            link = os.path.join(in_dir, stem + os.path.splitext(path)[1].lower())
+            try:
+                # realesrgan 遍历目录时只接受普通文件，符号链接会被跳过，因此用硬链接，跨文件系统时复制
+                try:
+                    os.link(path, link)
+                except OSError:
+                    shutil.copy2(path, link)
+            except OSError as e:
+                errors[path] = str(e)
+                continue
+            names[stem] = path
+            links[stem] = link
+        if not names:
+            return errors
+
+        cmd = [exe_path, "-i", in_dir, "-o", out_dir, "-f", "png", *extra_args]
+        proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                text=True, errors="replace")
+        if started:
+            started(proc)
+        lines = deque(maxlen=2000)
+        reader = threading.Thread(
+            target=lambda: lines.extend(line.rstrip() for line in proc.stderr if line.strip()),
+            daemon=True
+        )
+        reader.start()
+        total = len(names)
+        reported = -1
+        while proc.poll() is None:
+            done = len(os.listdir(out_dir))
+            if done != reported:
+                reported = done
+                progress(min(done, total), total)
+            time.sleep(POLL_INTERVAL)
+        reader.join()
+
+        if proc.returncode < 0:
+            # 被终止时正在写入的结果可能不完整，全部丢弃
+            for path in names.values():
+                errors[path] = "已终止"
+            return errors
+        tail = "\n".join(list(lines)[-5:])
+        for stem, path in names.items():
+            result = os.path.join(out_dir, stem + ".png")
+            if os.path.exists(result):
+                target = os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0] + ".png")
+                shutil.move(result, target)
+                continue
+            related = [line.replace(links[stem], path) for line in lines if stem in line]
+            errors[path] = "\n".join(related) or (
+                f"realesrgan-ncnn-vulkan 没有生成结果（退出码 {proc.returncode}）\n{tail}".rstrip()
+            )
+        progress(total, total)
+        return errors
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _fixed_dim(value):
+    return value if isinstance(value, int) and value > 0 else None
+
+
+def _ramp(length, pad_before, pad_after):
+    """一维权重：核心区域为 1；重叠区域靠外的一半受窗口边缘影响，权重为 0，靠内的一半线性过渡"""
+    weight = np.ones(length, dtype=np.float32)
+    if pad_before:
+        weight[:pad_before] = _edge_ramp(pad_before)
+    if pad_after:
+        weight[length - pad_after:] = _edge_ramp(pad_after)[::-1]
+    return weight
+
+
+def _edge_ramp(pad):
+    ramp = np.zeros(pad, dtype=np.float32)
+    half = pad // 2
+    ramp[half:] = (np.arange(pad - half, dtype=np.float32) + 1) / (pad - half + 1)
+    return ramp
+
+
+class TiledUpscaler:
+    """用 Real-ESRGAN 兼容的 ONNX 模型在 CPU 上分块放大图片
+
+    图片按行分成条带，每个条带再按列分块；每块向四周多取 overlap 像素推理，
+    重叠部分按线性权重混合。只保留当前条带的累加缓冲区，配合 upscale_to_png 按条带写出时
+    内存与分块大小和图片宽度成正比，不随图片高度增长。模型输入为 [1, 3, H, W]、取值 0~1 的 RGB。
+    """
+
+    def __init__(self, session, tile=DEFAULT_TILE, overlap=DEFAULT_TILE_OVERLAP):
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+        shape = session.get_inputs()[0].shape
+        # 模型输入尺寸固定时，分块窗口必须与之相同
+        self.window_h = _fixed_dim(shape[2])
+        self.window_w = _fixed_dim(shape[3])
+        self.overlap = max(0, overlap)
+        size = min(d for d in (self.window_h, self.window_w, tile + 2 * self.overlap) if d)
+        self.overlap = min(self.overlap, (size - 1) // 2)
+        self.tile = size - 2 * self.overlap
+        self.scale = None
+
+    def _infer(self, window):
+        """推理一个 HWC uint8 窗口，固定输入尺寸的模型先在边缘复制填充，返回 HWC float32"""
+        h, w = window.shape[:2]
+        pad_h = (self.window_h or h) - h
+        pad_w = (self.window_w or w) - w
+        if pad_h or pad_w:
+            window = np.pad(window, ((0, pad_h), (0, pad_w), (0, 0)), mode="edge")
+        x = np.ascontiguousarray(window.transpose((2, 0, 1))[np.newaxis], dtype=np.float32)
+        x *= 1.0 / 255.0
+        out = self.session.run(None, {self.input_name: x})[0][0]
+        if self.scale is None:
+            self.scale = out.shape[1] // window.shape[0]
+        out = out[:, :h * self.scale, :w * self.scale]
+        return out.transpose((1, 2, 0))
+
+    def _source(self, img):
+        """拆出 RGB 数组和透明通道（没有时为 None）"""
+        alpha = None
+        if img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info:
+            alpha = img.convert('RGBA').getchannel('A')
+        rgb = np.asarray(img if img.mode == 'RGB' else img.convert('RGB'))
+        return rgb, alpha
+
+    def _rows(self, rgb, progress=None):
+        """逐条带推理，依次产生 (输出起始行, 已确定的 uint8 行)，progress(已完成条带数, 条带总数)"""
+        height, width = rgb.shape[:2]
+        ov = self.overlap
+        strips = list(range(0, height, self.tile))
+        carry = None  # 上一条带与当前条带重叠部分的 (累加值, 权重)
+        for index, y0 in enumerate(strips):
+            y1 = min(y0 + self.tile, height)
+            wy0, wy1 = max(0, y0 - ov), min(height, y1 + ov)
+            acc = None
+            for x0 in range(0, width, self.tile):
+                x1 = min(x0 + self.tile, width)
+                wx0, wx1 = max(0, x0 - ov), min(width, x1 + ov)
+                out = self._infer(rgb[wy0:wy1, wx0:wx1])
+                s = self.scale
+                if acc is None:
+                    acc = np.zeros(((wy1 - wy0) * s, width * s, 3), dtype=np.float32)
+                    weight = np.zeros(((wy1 - wy0) * s, width * s, 1), dtype=np.float32)
+                wy = _ramp((wy1 - wy0) * s, (y0 - wy0) * s, (wy1 - y1) * s)
+                wx = _ramp((wx1 - wx0) * s, (x0 - wx0) * s, (wx1 - x1) * s)
+                w = wy[:, None, None] * wx[None, :, None]
+                acc[:, wx0 * s:wx1 * s] += out * w
+                weight[:, wx0 * s:wx1 * s] += w
+            s = self.scale
+            if carry is not None:
+                rows = carry[0].shape[0]
+                acc[:rows] += carry[0]
+                weight[:rows] += carry[1]
+            # 下一个条带的窗口从 next_start 开始，之前的行已经不会再变化
+            next_start = max(0, y1 - ov) if y1 < height else height
+            done_rows = (next_start - wy0) * s
+            final = acc[:done_rows] / np.maximum(weight[:done_rows], 1e-6)
+            yield wy0 * s, np.clip(final * 255.0 + 0.5, 0, 255).astype(np.uint8)
+            carry = (acc[done_rows:], weight[done_rows:]) if done_rows < acc.shape[0] else None
+            if progress:
+                progress(index + 1, len(strips))
+
+    def upscale(self, img, progress=None):
+        """放大一张图片并返回 Image，透明通道单独用双三次插值放大"""
+        rgb, alpha = self._source(img)
+        parts = [rows for _, rows in self._rows(rgb, progress)]
+        result = Image.fromarray(np.concatenate(parts))
+        if alpha is not None:
+            result.putalpha(alpha.resize(result.size, Image.BICUBIC))
+        return result
+
+    def upscale_to_png(self, img, path, progress=None):
+        """放大一张图片并按条带直接写成 PNG，不在内存中保留整幅放大结果"""
+        rgb, alpha = self._source(img)
+        height, width = rgb.shape[:2]
+        writer = None
+        try:
+            for y, rows in self._rows(rgb, progress):
+                if writer is None:
+                    s = self.scale
+                    writer = PngStripWriter(path, width * s, height * s, 'RGB' if alpha is None else 'RGBA')
+                if alpha is not None:
+                    # box 指定条带对应的源区域，与整幅放大的采样位置一致
+                    strip_alpha = alpha.resize((width * s, rows.shape[0]), Image.BICUBIC,
+                                               box=(0, y / s, width, (y + rows.shape[0]) / s))
+                    rows = np.dstack((rows, np.asarray(strip_alpha)))
+                writer.write(rows)
+        except Exception:
+            if writer is not None:
+                writer.abort()
+            raise
+        writer.close()
@@ -16,7 +16,7 @@ from PySide6.QtGui import (QAction, QBrush, QColor, QConicalGradient,
     QIcon, QImage, QKeySequence, QLinearGradient,
     QPainter, QPalette, QPixmap, QRadialGradient,
     QTransform)
-from PySide6.QtWidgets import (QApplication, QComboBox, QHeaderView, QLabel,
+from PySide6.QtWidgets import (QApplication, QCheckBox, QComboBox, QHeaderView, QLabel,
     QLineEdit, QMainWindow, QMenu, QMenuBar,
     QPushButton, QSizePolicy, QStackedWidget, QStatusBar,
     QTableWidget, QTableWidgetItem, QTextEdit, QWidget)
@@ -316,6 +316,10 @@ class Ui_MainWindow(object):
         self.comboBox_5.addItem("")
         self.comboBox_5.setObjectName(u"comboBox_5")
         self.comboBox_5.setGeometry(QRect(550, 100, 81, 31))
+        self.checkBox = QCheckBox(self.page_4)
+        self.checkBox.setObjectName(u"checkBox")
+        self.checkBox.setGeometry(QRect(480, 380, 161, 31))
+        self.checkBox.setFont(font2)
         self.stackedWidget.addWidget(self.page_4)
         self.pushButton_24 = QPushButton(self.centralwidget)
         self.pushButton_24.setObjectName(u"pushButton_24")
@@ -517,6 +521,10 @@ class Ui_MainWindow(object):
 #if QT_CONFIG(tooltip)
         self.comboBox_5.setToolTip(QCoreApplication.translate("MainWindow", u"<html><head/><body><p>\u8fd9\u662f\u89c6\u9891\u7f16\u7801\u5668\uff0c\u4e00\u822c\u9ed8\u8ba4\u5373\u53ef\u3002libx264\u517c\u5bb9\u6027\u597d\uff0c\u5904\u7406\u901f\u5ea6\u5feb\u3002libx265\u538b\u7f29\u7a0b\u5e8f\u66f4\u597d\uff0c\u901f\u5ea6\u7565\u6162</p></body></html>", None))
 #endif // QT_CONFIG(tooltip)
+#if QT_CONFIG(tooltip)
+        self.checkBox.setToolTip(QCoreApplication.translate("MainWindow", u"<html><head/><body><p>\u957f\u89c6\u9891\u6309\u5173\u952e\u5e27\u5207\u6210\u591a\u6bb5\u5e76\u53d1\u7f16\u7801\uff0c\u5b8c\u6210\u540e\u65e0\u635f\u62fc\u63a5\uff0c\u591a\u6838\u673a\u5668\u4e0a\u901f\u5ea6\u66f4\u5feb</p></body></html>", None))
+#endif // QT_CONFIG(tooltip)
+        self.checkBox.setText(QCoreApplication.translate("MainWindow", u"\u5206\u6bb5\u5e76\u884c\u7f16\u7801", None))
 #if QT_CONFIG(tooltip)
         self.pushButton_24.setToolTip(QCoreApplication.translate("MainWindow", u"<html><head/><body><p>\u4e00\u952e\u62a0\u56fe\uff0c\u66f4\u6362\u80cc\u666f\uff0c\u56fe\u7247\u9ad8\u6e05\u5904\u7406</p></body></html>", None))
 #endif // QT_CONFIG(tooltip)
@@ -1,19 +1,35 @@
 import sys
 from PIL import Image
 import numpy as np
-import onnxruntime as ort
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                               QLabel, QPushButton, QFileDialog, QColorDialog, QSizePolicy, 
-                              QMessageBox, QProgressDialog, QFrame)
-from PySide6.QtGui import QPixmap
+                              QMessageBox, QProgressDialog, QFrame, QInputDialog)
+from PySide6.QtGui import QPixmap, QColor
 from PySide6.QtCore import Qt, Signal, QThread, QObject
 import os
 import tempfile
 import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from page.koutu_ops import (to_rgb, load_rgb, prepare_input, normalize_mask, compose_rgba,
+                            dynamic_batch, pipeline_workers, strip_rows, save_cutout, load_variants,
+                            render_backgrounds, BatchTuner, MODEL_SIZE, BATCH_PIXEL_BUDGET,
+                            DEFAULT_MEMORY_BUDGET_MB)
+from page.koutu_session import (model_file, model_tag, create_session, create_sr_session,
+                                int_setting, KOUTU_SETTINGS_FILE)
+from page.mask_cache import MaskCache, DEFAULT_CAPACITY
+from page.koutu_pool import run_in_processes, SHARD_SIZE
+from page.enhance_ops import enhance_batch_ncnn, TiledUpscaler, DEFAULT_TILE, DEFAULT_TILE_OVERLAP
+from core.command import read_config
 # 指定为xcb
 os.environ['QT_QPA_PLATFORM'] = 'xcb'
 import subprocess
 
+# 需要抠图模型的操作
+CUTOUT_OPERATIONS = ("remove_bg", "change_bg_color", "multi_background")
+
 
 class PhotoProcessor(QObject):
     finished = Signal(str)  # 返回临时文件路径
@@ -22,6 +38,49 @@ class PhotoProcessor(QObject):
     progress = Signal(int)
 
     ort_session = None
+    sr_session = None  # 一键清晰 CPU 后端（清晰化后端=onnx）的会话，同样在整个程序中共享
+    batch_tuner = None  # 批大小的自动选择结果在整个程序运行期间共享
+    mask_cache = None  # 与会话一起创建，同一张图片重复抠图、换背景时不再推理
+    model_path = None  # 当前会话使用的模型文件，多进程批量处理时工作进程各自加载
+    _session_lock = threading.Lock()
+    _warmed = False
+
+    @classmethod
+    def load_session(cls):
+        """创建（或返回已创建的）共享推理会话，可在任意线程调用"""
+        with cls._session_lock:
+            if cls.ort_session is None:
+                # 模型、线程数、图优化级别、掩码缓存等读取 config/koutu_settings.ini
+                config = read_config(KOUTU_SETTINGS_FILE)
+                model_path = model_file(os.path.dirname(__file__), config)
+                session = create_session(model_path, config)
+                # 模型的批维度固定时只能逐张推理
+                cls.batch_tuner = BatchTuner(dynamic_batch(session))
+                cls.mask_cache = MaskCache(model_tag(model_path),
+                                           int_setting(config, "掩码缓存数量", DEFAULT_CAPACITY),
+                                           config.get("掩码缓存目录"))
+                cls.model_path = model_path
+                cls.ort_session = session
+        return cls.ort_session
+
+    @classmethod
+    def load_sr_session(cls, config):
+        with cls._session_lock:
+            if cls.sr_session is None:
+                cls.sr_session = create_sr_session(config)
+        return cls.sr_session
+
+    @classmethod
+    def warm_up(cls):
+        """创建会话并用 320x320 的空输入推理一次，之后的第一次抠图直接使用预热好的会话"""
+        session = cls.load_session()
+        with cls._session_lock:
+            if cls._warmed:
+                return
+            dummy = np.zeros((1, 3, MODEL_SIZE, MODEL_SIZE), dtype=np.float32)
+            session.run(None, {session.get_inputs()[0].name: dummy})
+            cls.batch_tuner.mark_warm()
+            cls._warmed = True
 
     def __init__(self, image_path, operation, **kwargs):
         super().__init__()
@@ -31,13 +90,19 @@ class PhotoProcessor(QObject):
         self.batch_mode = kwargs.get('batch_mode', False)
         self.output_dir = kwargs.get('output_dir', None)
         self._subprocess = None  # 保存子进程对象
-        if PhotoProcessor.ort_session is None:
-            model_path = os.path.join(os.path.dirname(__file__), "u2netp.onnx")
-            PhotoProcessor.ort_session = ort.InferenceSession(model_path, providers=['CPUExecutionProvider'])
-        self.ort_session = PhotoProcessor.ort_session
+        self._input_buffer = None  # 模型输入缓冲区，批量处理时复用
+        self.ort_session = None
+        self.settings = read_config(KOUTU_SETTINGS_FILE)
+        self._stopped = False
+
+    def _ensure_session(self):
+        """在处理线程中取得会话，会话仍在后台加载时等待加载完成，不阻塞界面"""
+        if self.operation in CUTOUT_OPERATIONS:
+            self.ort_session = PhotoProcessor.load_session()
 
     def terminate(self):
-        """终止子进程"""
+        """终止子进程，CPU 分块推理在处理完当前条带后停止"""
+        self._stopped = True
         if self._subprocess and self._subprocess.poll() is None:
             try:
                 self._subprocess.terminate()
@@ -46,14 +111,13 @@ class PhotoProcessor(QObject):
 
     def process(self):
         try:
+            self._ensure_session()
             if isinstance(self.image_path, list):  # 批量处理模式
                 self._process_batch()
             else:  # 单张图片处理模式
                 img_path = self.image_path
-                if self.operation == "remove_bg":
-                    result_path = self._remove_background(img_path)
-                elif self.operation == "change_bg_color":
-                    result_path = self._change_background_color(img_path)
+                if self.operation in ("remove_bg", "change_bg_color"):
+                    result_path = self._cutout_to_temp(img_path)
                 elif self.operation == "enhance_image":
                     result_path = self._enhance_image(img_path)
                 else:
@@ -66,94 +130,270 @@ class PhotoProcessor(QObject):
         """批量处理图片"""
         errors = []  # 用于存储错误信息
         try:
-            total = len(self.image_path)
-            for i, path in enumerate(self.image_path, 1):
-                try:
-                    img = Image.open(path)
-                    if self.operation == "remove_bg":
-                        output = self.remove_bg_onnx(img)
-                    elif self.operation == "change_bg_color":
-                        no_bg = self.remove_bg_onnx(img)
-                        color = self.kwargs.get('color', (255, 255, 255))
-                        output = Image.new('RGB', no_bg.size, color)
-                        output.paste(no_bg, (0, 0), no_bg)
-                    elif self.operation == "enhance_image":
-                        import tempfile
-                        import shutil
-                        exe_path = os.path.join(os.path.dirname(__file__), "realesrgan-ncnn-vulkan")
-                        temp_dir = tempfile.mkdtemp()
-                        output_path = os.path.join(temp_dir, "enhanced.png")
-                        cmd = [
-                            exe_path,
-                            "-i", path,
-                            "-o", output_path,
-                        ]
-                        try:
-                            subprocess.run(cmd, check=True)
-                            enhanced_img = Image.open(output_path)
-                            output = enhanced_img.convert("RGBA")
-                        finally:
-                            try:
-                                shutil.rmtree(temp_dir)
-                            except Exception:
-                                pass
-                    else:
-                        continue
-                    if self.output_dir:
-                        filename = os.path.basename(path)
-                        save_path = os.path.join(self.output_dir, filename)
-                        if self.operation == "enhance_image":
-                            save_path = os.path.splitext(save_path)[0] + ".png"
-                        output.save(save_path)
-                    self.progress.emit(int(i * 100 / total))
-                except Exception as e:
-                    errors.append(f"{path}: {str(e)}")
+            if self.operation in CUTOUT_OPERATIONS and self._batch_processes() > 1:
+                self._remove_bg_processes(errors)
+            elif self.operation in CUTOUT_OPERATIONS:
+                if self.operation == "multi_background":
+                    self._prepare_variants()
+                self._remove_bg_batches(errors)
+            elif self.operation == "enhance_image":
+                self._enhance_batch(errors)
+            if self._stopped:
+                return  # 已取消，界面已经恢复，不再报告完成
             self.batch_finished.emit()
             if errors:
                 self.error.emit('\n'.join(errors))
         except Exception as e:
-            self.error.emit(str(e))
+            if not self._stopped:
+                self.error.emit(str(e))
+
+    def _remove_bg_batches(self, errors):
+        """批量去除背景：解码 -> 推理 -> 合成保存三段流水线
+
+        解码和合成保存各用一个线程池，推理只在当前线程中进行（独占 InferenceSession），
+        每次把 B 张图片叠成一个张量，B 由 batch_tuner 自动选择。
+        阶段之间的队列都有上限，不会有大量原图同时留在内存中。
+        """
+        paths = list(self.image_path)
+        total = len(paths)
+        workers = pipeline_workers()
+        decoding = deque()  # 按输入顺序排列的 (路径, future)
+        encoding = deque()  # 等待合成保存完成的 (路径, future)
+        next_index = 0
+        done = 0
+
+        def finish(path, error=None):
+            nonlocal done
+            if error is not None:
+                errors.append(f"{path}: {str(error)}")
+            done += 1
+            self.progress.emit(int(done * 100 / total))
+
+        def wait_encoded():
+            path, future = encoding.popleft()
+            try:
+                future.result()
+                finish(path)
+            except Exception as e:
+                finish(path, e)
+
+        with ThreadPoolExecutor(workers) as decoder, ThreadPoolExecutor(workers) as encoder:
+            def fill_decoding():
+                nonlocal next_index
+                limit = max(self.batch_tuner.next_size(), workers) + workers
+                while next_index < total and len(decoding) < limit:
+                    path = paths[next_index]
+                    next_index += 1
+                    decoding.append((path, decoder.submit(load_rgb, path)))
+
+            fill_decoding()
+            while decoding and not self._stopped:
+                size = self.batch_tuner.next_size()
+                chunk = []  # (路径, RGB 图片)
+                pixels = 0
+                while decoding and len(chunk) < size and pixels < BATCH_PIXEL_BUDGET:
+                    path, future = decoding.popleft()
+                    fill_decoding()
+                    try:
+                        rgb = future.result()
+                    except Exception as e:
+                        finish(path, e)
+                        continue
+                    chunk.append((path, rgb))
+                    pixels += rgb.width * rgb.height
+                if not chunk:
+                    continue
+                for (path, rgb), mask in zip(chunk, self._predict_chunk([rgb for _, rgb in chunk])):
+                    if isinstance(mask, Exception):
+                        finish(path, mask)
+                        continue
+                    while len(encoding) >= workers * 2:
+                        wait_encoded()
+                    encoding.append((path, encoder.submit(self._compose_and_save, path, rgb, mask)))
+                # 已经完成的保存任务及时计入进度
+                while encoding and encoding[0][1].done():
+                    wait_encoded()
+            while encoding:
+                wait_encoded()
+
+    def _batch_processes(self):
+        """批量进程数（默认 0 即不启用），图片不超过一个分片时不值得启动进程"""
+        processes = int_setting(self.settings, "批量进程数")
+        return min(processes, -(-len(self.image_path) // SHARD_SIZE))
+
+    def _remove_bg_processes(self, errors):
+        """多进程批量抠图：文件列表分片交给工作进程，进度和错误在这里汇总"""
+        job = {
+            "operation": self.operation,
+            "output_dir": self.output_dir,
+            "color": self._background_color(),
+            "variants": self.kwargs.get('variants', []),
+            "budget": self._memory_budget(),
+        }
+        failures = run_in_processes(
+            list(self.image_path), job, PhotoProcessor.model_path, self.settings, self._batch_processes(),
+            progress=lambda done, total: self.progress.emit(int(done * 100 / total)),
+            stopped=lambda: self._stopped
+        )
+        errors.extend(f"{path}: {message}" for path, message in failures.items())
 
-    def _remove_background(self, img_path):
-        img = Image.open(img_path)
-        output = self.remove_bg_onnx(img)
-        temp_file = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
-        output.save(temp_file.name)
-        return temp_file.name
+    def _predict_chunk(self, rgbs):
+        """推理一批图片，返回掩码列表，单张失败时对应位置是异常对象"""
+        try:
+            return self.predict_masks(rgbs)
+        except Exception as e:
+            if len(rgbs) == 1:
+                return [e]
+        # 模型声明了动态批维度但实际不支持时，退回逐张推理
+        self.batch_tuner.disable()
+        masks = []
+        for rgb in rgbs:
+            try:
+                masks.append(self.predict_masks([rgb])[0])
+            except Exception as e:
+                masks.append(e)
+        return masks
+
+    def _compose_and_save(self, path, rgb, mask):
+        """合成保存阶段，在线程池中运行"""
+        if not self.output_dir:
+            return
+        filename = os.path.basename(path)
+        if self.operation == "multi_background":
+            render_backgrounds(rgb, mask, self._backgrounds,
+                               [os.path.join(folder, filename) for folder in self._variant_dirs],
+                               strip_rows(rgb.width, self._memory_budget()))
+        else:
+            self._save_composite(rgb, mask, os.path.join(self.output_dir, filename))
+
+    def _prepare_variants(self):
+        """kwargs['variants'] 为 (名称, 颜色元组或背景图片路径) 列表，每种背景一个子文件夹"""
+        self._backgrounds, self._variant_dirs = load_variants(self.kwargs.get('variants', []), self.output_dir)
 
-    def _change_background_color(self, img_path):
-        color = self.kwargs.get('color', (255, 255, 255))
-        img = Image.open(img_path)
-        no_bg = self.remove_bg_onnx(img)
-        background = Image.new('RGB', no_bg.size, color)
-        background.paste(no_bg, (0, 0), no_bg)
+    def _save_composite(self, rgb, mask, save_path):
+        """合成并保存抠图结果，整幅结果超过内存预算的 PNG 按条带合成写出"""
+        save_cutout(rgb, mask, save_path, self._background_color(), self._memory_budget())
+
+    def _background_color(self):
+        """更换背景颜色时返回背景色，去除背景时为 None"""
+        if self.operation != "change_bg_color":
+            return None
+        return self.kwargs.get('color', (255, 255, 255))
+
+    def _memory_budget(self):
+        return int_setting(self.settings, "大图内存预算(MB)", DEFAULT_MEMORY_BUDGET_MB) or DEFAULT_MEMORY_BUDGET_MB
+
+    def _enhance_batch(self, errors):
+        """批量修复：整批图片只启动一次 realesrgan-ncnn-vulkan，进度按已生成的结果统计"""
+        if self._use_onnx_enhancer():
+            self._enhance_batch_onnx(errors)
+            return
+        exe_path = os.path.join(os.path.dirname(__file__), "realesrgan-ncnn-vulkan")
+        failures = enhance_batch_ncnn(
+            exe_path, self.image_path, self.output_dir,
+            progress=lambda done, total: self.progress.emit(int(done * 100 / total)),
+            started=self._set_subprocess
+        )
+        errors.extend(f"{path}: {message}" for path, message in failures.items())
+
+    def _enhance_batch_onnx(self, errors):
+        """批量修复（CPU 后端）：逐张分块推理，进度包含当前图片已完成的条带"""
+        total = len(self.image_path)
+        upscaler = self._upscaler()
+        for i, path in enumerate(self.image_path):
+            if self._stopped:
+                break
+            try:
+                name = os.path.splitext(os.path.basename(path))[0] + ".png"
+                upscaler.upscale_to_png(
+                    Image.open(path), os.path.join(self.output_dir, name),
+                    progress=lambda done, strips: self._check_strip(int((i + done / strips) * 100 / total))
+                )
+            except Exception as e:
+                errors.append(f"{path}: {str(e)}")
+            self.progress.emit(int((i + 1) * 100 / total))
+
+    def _set_subprocess(self, proc):
+        self._subprocess = proc
+
+    def _cutout_to_temp(self, img_path):
+        """单张去除背景或更换背景，结果保存为临时 PNG"""
+        rgb = load_rgb(img_path)
         temp_file = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
-        background.save(temp_file.name)
+        self._save_composite(rgb, self.predict_masks([rgb])[0], temp_file.name)
         return temp_file.name
 
     def remove_bg_onnx(self, img):
-        # 预处理
-        img = img.convert('RGB')
-        im = img.resize((320, 320), Image.BILINEAR)
-        arr = np.array(im).astype(np.float32) / 255.0
-        arr = arr.transpose((2, 0, 1))[np.newaxis, ...]
+        rgb = to_rgb(img)
+        # 后处理：掩码只放大一次，直接写入 RGBA 图像的透明通道
+        return compose_rgba(rgb, self.predict_masks([rgb])[0])
+
+    def predict_masks(self, rgbs):
+        """把多张 RGB 图片叠成一个 [B, 3, 320, 320] 张量一次推理，返回每张图片 320x320 的 uint8 掩码
+
+        模型输入相同的图片直接从 mask_cache 取出掩码，只推理未命中的部分。
+        """
+        count = len(rgbs)
+        # 预处理：模型输入直接写入复用的缓冲区
+        if self._input_buffer is None or self._input_buffer.shape[0] < count:
+            self._input_buffer = np.empty((count, 3, MODEL_SIZE, MODEL_SIZE), dtype=np.float32)
+        batch = self._input_buffer[:count]
+        keys = []
+        masks = []
+        missing = []
+        for i, rgb in enumerate(rgbs):
+            prepare_input(rgb, batch[i])
+            keys.append(self.mask_cache.key(batch[i]))
+            masks.append(self.mask_cache.get(keys[i]))
+            if masks[i] is None:
+                missing.append(i)
+        if not missing:
+            return masks
+        if len(missing) < count:
+            batch = self._input_buffer[:len(missing)]
+            batch[:] = self._input_buffer[missing]
         # 推理
-        ort_inputs = {self.ort_session.get_inputs()[0].name: arr}
+        ort_inputs = {self.ort_session.get_inputs()[0].name: batch}
+        start = time.perf_counter()
         ort_outs = self.ort_session.run(None, ort_inputs)
-        pred = ort_outs[0][0][0]
-        # 后处理
-        pred = (pred - pred.min()) / (pred.max() - pred.min() + 1e-8)
-        mask = (pred * 255).astype(np.uint8)
-        mask = Image.fromarray(mask).resize(img.size, Image.BILINEAR)
-        # 合成透明背景
-        img_rgba = img.convert("RGBA")
-        mask_np = np.array(mask)
-        img_np = np.array(img_rgba)
-        img_np[..., 3] = mask_np
-        return Image.fromarray(img_np)
+        self.batch_tuner.record(len(missing), time.perf_counter() - start)
+        for j, i in enumerate(missing):
+            masks[i] = normalize_mask(ort_outs[0][j][0])
+            self.mask_cache.put(keys[i], masks[i])
+        return masks
+
+    def _use_onnx_enhancer(self):
+        return self.settings.get("清晰化后端") == "onnx"
+
+    def _upscaler(self):
+        return TiledUpscaler(PhotoProcessor.load_sr_session(self.settings),
+                             tile=int_setting(self.settings, "清晰化分块大小", DEFAULT_TILE) or DEFAULT_TILE,
+                             overlap=int_setting(self.settings, "清晰化分块重叠", DEFAULT_TILE_OVERLAP))
+
+    def _check_strip(self, percent):
+        """分块推理每完成一个条带回调一次：报告进度，已取消时中止"""
+        if self._stopped:
+            raise RuntimeError("已取消")
+        self.progress.emit(percent)
+
+    def _enhance_image_onnx(self, image_path):
+        """用 onnxruntime 在 CPU 上分块推理增强图片清晰度"""
+        try:
+            self.progress.emit(10)
+            temp_file = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
+            self._upscaler().upscale_to_png(
+                Image.open(image_path), temp_file.name,
+                progress=lambda done, strips: self._check_strip(10 + int(done * 85 / strips))
+            )
+            self.progress.emit(100)
+            return temp_file.name
+        except Exception as e:
+            raise RuntimeError(f"图片增强失败: {e}")
 
     def _enhance_image(self, image_path):
         """调用realesrgan-ncnn-vulkan增强图片清晰度"""
+        if self._use_onnx_enhancer():
+            return self._enhance_image_onnx(image_path)
         exe_path = os.path.join(os.path.dirname(__file__), "realesrgan-ncnn-vulkan")
         temp_dir = tempfile.mkdtemp()
         output_path = os.path.join(temp_dir, "enhanced.png")
@@ -171,8 +411,9 @@ class PhotoProcessor(QObject):
             if self._subprocess.returncode != 0:
                 raise RuntimeError("realesrgan-ncnn-vulkan 运行失败")
             self.progress.emit(80)
+            # 结果已经是 PNG，直接移动过来，不再整幅解码后重新编码
             temp_file = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
-            Image.open(output_path).save(temp_file.name)
+            shutil.move(output_path, temp_file.name)
             self.progress.emit(100)
             return temp_file.name
         except Exception as e:
@@ -183,6 +424,31 @@ class PhotoProcessor(QObject):
             except Exception:
                 pass
 
+class SessionWarmer(QObject):
+    """在后台守护线程中加载并预热抠图模型，信号排队送回界面线程"""
+    ready = Signal(float)  # 加载和预热耗时（秒）
+    error = Signal(str)
+
+    def __init__(self):
+        super().__init__()
+        self._aborted = False
+
+    def abort(self):
+        """窗口关闭时调用：已开始的模型加载无法中断，加载完成后跳过预热推理"""
+        self._aborted = True
+
+    def run(self):
+        try:
+            start = time.perf_counter()
+            PhotoProcessor.load_session()
+            if self._aborted:
+                return
+            PhotoProcessor.warm_up()
+            self.ready.emit(time.perf_counter() - start)
+        except Exception as e:
+            if not self._aborted:
+                self.error.emit(str(e))
+
 class PhotoIDTool(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -197,6 +463,23 @@ class PhotoIDTool(QMainWindow):
 
         # 创建界面
         self._create_ui()
+        self._start_warm_up()
+
+    def _start_warm_up(self):
+        """窗口打开后立即在后台加载模型，状态栏显示是否就绪"""
+        self.statusBar().showMessage("正在加载抠图模型...")
+        self.warmer = SessionWarmer()
+        self.warmer.ready.connect(self.on_model_ready)
+        self.warmer.error.connect(self.on_model_error)
+        # 守护线程：加载中关闭窗口或退出程序时不需要等待
+        self.warm_thread = threading.Thread(target=self.warmer.run, daemon=True)
+        self.warm_thread.start()
+
+    def on_model_ready(self, seconds):
+        self.statusBar().showMessage(f"抠图模型已就绪（加载 {seconds:.1f} 秒）", 5000)
+
+    def on_model_error(self, error_msg):
+        self.statusBar().showMessage(f"抠图模型加载失败：{error_msg}")
 
     def _create_ui(self):
         """创建主界面"""
@@ -285,6 +568,11 @@ class PhotoIDTool(QMainWindow):
         self.batch_bg_btn.clicked.connect(self.batch_change_background)
         control_layout.addWidget(self.batch_bg_btn)
 
+        self.batch_multi_bg_btn = QPushButton("批量多背景")
+        self.batch_multi_bg_btn.setToolTip("每张图片只抠一次，同时生成多种背景颜色/背景图片，每种背景一个子文件夹")
+        self.batch_multi_bg_btn.clicked.connect(self.batch_multi_background)
+        control_layout.addWidget(self.batch_multi_bg_btn)
+
         # 新增：批量修复高清图片按钮
         self.batch_enhance_btn = QPushButton("批量修复高清图片")
         self.batch_enhance_btn.clicked.connect(self.batch_enhance_images)
@@ -329,6 +617,7 @@ class PhotoIDTool(QMainWindow):
         self.progress_dialog.setWindowTitle(dialog_title)
         self.progress_dialog.setWindowModality(Qt.WindowModal)
         self.progress_dialog.setAutoClose(True)
+        self.progress_dialog.canceled.connect(self.cancel_batch_process)
         self.progress_dialog.show()
 
         self.thread = QThread()
@@ -351,6 +640,21 @@ class PhotoIDTool(QMainWindow):
         self.set_buttons_enabled(False)
         self.thread.start()
 
+    def cancel_batch_process(self):
+        """取消批量处理：尚未开始的图片不再处理，正在处理的图片完成后线程退出"""
+        if hasattr(self, 'processor') and self.processor:
+            self.processor.terminate()
+        if hasattr(self, 'thread') and self.thread:
+            self.thread.quit()
+        self.set_buttons_enabled(True)
+        self.statusBar().showMessage("已取消批量处理", 3000)
+
+    def _close_batch_dialog(self):
+        if hasattr(self, 'progress_dialog') and self.progress_dialog:
+            # close() 也会触发 canceled，先断开，避免把已完成的批次当作取消
+            self.progress_dialog.canceled.disconnect(self.cancel_batch_process)
+            self.progress_dialog.close()
+
     def batch_open_images(self):
         """批量去除背景文件"""
         file_paths, _ = QFileDialog.getOpenFileNames(
@@ -390,6 +694,45 @@ class PhotoIDTool(QMainWindow):
                 color=self.bg_color
             )
 
+    def batch_multi_background(self):
+        """批量生成多种背景：颜色列表加可选的背景图片"""
+        text, ok = QInputDialog.getText(
+            self, "批量多背景", "背景颜色（用逗号分隔，可留空）：",
+            text="#FFFFFF,#F5F5F5,#000000"
+        )
+        if not ok:
+            return
+        variants = []
+        for name in [c.strip() for c in text.replace("，", ",").split(",") if c.strip()]:
+            color = QColor(name)
+            if not color.isValid():
+                QMessageBox.warning(self, "警告", f"无法识别的颜色：{name}")
+                return
+            variants.append((f"颜色_{color.name()[1:].upper()}", (color.red(), color.green(), color.blue())))
+        if QMessageBox.question(self, "批量多背景", "是否再添加背景图片？") == QMessageBox.Yes:
+            image_paths, _ = QFileDialog.getOpenFileNames(
+                self, "选择背景图片", "",
+                "图片文件 (*.png *.jpg *.jpeg *.bmp *.tiff *.webp)"
+            )
+            for image_path in image_paths:
+                variants.append((f"图片_{os.path.splitext(os.path.basename(image_path))[0]}", image_path))
+        if not variants:
+            QMessageBox.warning(self, "警告", "请至少指定一种背景!")
+            return
+        file_paths, _ = QFileDialog.getOpenFileNames(
+            self, "选择多张图片", "",
+            "图片文件 (*.png *.jpg *.jpeg *.bmp *.tiff *.webp *.ico)"
+        )
+        if file_paths:
+            output_dir = QFileDialog.getExistingDirectory(self, "选择输出目录")
+            if not output_dir:
+                return
+            self.start_batch_process(
+                "multi_background", file_paths, output_dir,
+                "批量处理", f"批量生成 {len(variants)} 种背景中...",
+                variants=variants
+            )
+
     def batch_enhance_images(self):
         """批量修复高清图片"""
         file_paths, _ = QFileDialog.getOpenFileNames(
@@ -413,8 +756,7 @@ class PhotoIDTool(QMainWindow):
     def on_batch_finished(self):
         """批量处理完成（在主线程中）"""
         self.set_buttons_enabled(True)
-        if hasattr(self, 'progress_dialog'):
-            self.progress_dialog.close()
+        self._close_batch_dialog()
         QMessageBox.information(self, "完成", "批量处理完成!")
 
         if hasattr(self, 'processor') and self.processor.output_dir:
@@ -429,8 +771,7 @@ class PhotoIDTool(QMainWindow):
     def on_batch_error(self, error_msg):
         """批量处理错误（在主线程中）"""
         self.set_buttons_enabled(True)
-        if hasattr(self, 'progress_dialog'):
-            self.progress_dialog.close()
+        self._close_batch_dialog()
         QMessageBox.critical(self, "错误", f"批量处理出错:\n{error_msg}")
 
     def save_image(self):
@@ -559,6 +900,7 @@ class PhotoIDTool(QMainWindow):
         self.open_btn.setEnabled(enabled)
         self.batch_open_btn.setEnabled(enabled)
         self.batch_bg_btn.setEnabled(enabled)
+        self.batch_multi_bg_btn.setEnabled(enabled)
         self.remove_bg_btn.setEnabled(enabled)
         self.apply_bg_color_btn.setEnabled(enabled)
         self.save_btn.setEnabled(enabled)
@@ -566,6 +908,11 @@ class PhotoIDTool(QMainWindow):
 
     def closeEvent(self, event):
         """关闭窗口时自动清理所有临时文件"""
+        if self.warm_thread.is_alive():
+            # 已开始的模型加载无法中断，不等待它结束，只跳过预热并不再更新已关闭的窗口
+            self.warmer.ready.disconnect(self.on_model_ready)
+            self.warmer.error.disconnect(self.on_model_error)
+            self.warmer.abort()
         for f in getattr(self, "_temp_files", []):
             try:
                 if f and os.path.exists(f):
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""抠图用到的图像运算（预处理、掩码归一化、透明合成、批大小选择），不依赖 PySide6"""
+import os
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from page.png_stream import PngStripWriter
+
+MODEL_SIZE = 320  # u2netp 输入尺寸
+BATCH_CANDIDATES = (1, 2, 4, 8, 16)  # 自动选择批大小时依次尝试的值
+BATCH_PIXEL_BUDGET = 96 * 1000 * 1000  # 一批中同时保留的原图像素上限（RGB 约 288 MB）
+DEFAULT_MEMORY_BUDGET_MB = 256  # 合成结果超过该大小时改为按条带合成保存
+STRIP_BYTES_PER_PIXEL = 32  # 条带合成时每个像素的临时内存（裁剪、掩码、混合、过滤）估算
+
+
+def pipeline_workers():
+    """批量抠图时解码、合成保存线程池各自的线程数，剩余核心留给推理"""
+    return max(1, min(4, (os.cpu_count() or 2) // 4))
+
+
+def to_rgb(img):
+    """转换为 RGB，已经是 RGB 时不复制"""
+    return img if img.mode == 'RGB' else img.convert('RGB')
+
+
+def load_rgb(path):
+    """打开并完整解码图片，解码错误在这里抛出以便归到对应文件"""
+    rgb = to_rgb(Image.open(path))
+    rgb.load()
+    return rgb
+
+
+def prepare_input(rgb, out=None):
+    """缩放到模型尺寸并归一化为 [3, 320, 320] 的 float32，out 可传入复用的缓冲区"""
+    small = np.asarray(rgb.resize((MODEL_SIZE, MODEL_SIZE), Image.BILINEAR))
+    if out is None:
+        out = np.empty((3, MODEL_SIZE, MODEL_SIZE), dtype=np.float32)
+    # HWC -> CHW 的同时完成 /255，直接写入 out
+    np.multiply(small.transpose((2, 0, 1)), 1.0 / 255.0, out=out, casting='unsafe')
+    return out
+
+
+def normalize_mask(pred):
+    """把模型输出原地做最小-最大归一化，返回 uint8 掩码"""
+    pred = np.asarray(pred, dtype=np.float32)
+    pred -= pred.min()
+    pred *= 255.0 / (pred.max() + 1e-8)
+    return pred.astype(np.uint8)
+
+
+def compose_rgba(rgb, mask):
+    """掩码只放大一次，并原地写入唯一一份 RGBA 图像的透明通道"""
+    alpha = Image.fromarray(mask).resize(rgb.size, Image.BILINEAR)
+    rgba = rgb.convert('RGBA')
+    rgba.putalpha(alpha)
+    return rgba
+
+
+def needs_strips(rgb, budget_mb):
+    """整幅 RGBA 结果超过内存预算时返回 True"""
+    return rgb.width * rgb.height * 4 > budget_mb * 2 ** 20
+
+
+def strip_rows(width, budget_mb):
+    """按内存预算计算每个条带的行数"""
+    return max(16, min(4096, budget_mb * 2 ** 20 // (width * STRIP_BYTES_PER_PIXEL)))
+
+
+def save_composite_strips(rgb, mask, path, background=None, rows=256):
+    """按行条带合成并写成 PNG，不生成整幅 RGBA 图像
+
+    掩码每个条带单独放大，box 指定条带对应的掩码区域，结果与整幅放大一致；
+    background 为 (r, g, b) 时与背景色混合后写成 RGB。
+    """
+    width, height = rgb.size
+    small = Image.fromarray(mask)
+    scale_y = small.height / height
+    mode = 'RGBA' if background is None else 'RGB'
+    if background is not None:
+        background = np.asarray(background, dtype=np.float32)
+    with PngStripWriter(path, width, height, mode) as writer:
+        for y0 in range(0, height, rows):
+            y1 = min(height, y0 + rows)
+            strip = np.asarray(rgb.crop((0, y0, width, y1)))
+            alpha = np.asarray(small.resize((width, y1 - y0), Image.BILINEAR,
+                                            box=(0, y0 * scale_y, small.width, y1 * scale_y)))
+            if background is None:
+                writer.write(np.dstack((strip, alpha)))
+            else:
+                # 原地计算 背景 + (前景 - 背景) * a，减少临时数组
+                a = alpha[..., np.newaxis].astype(np.float32)
+                a *= 1.0 / 255.0
+                mixed = strip.astype(np.float32)
+                mixed -= background
+                mixed *= a
+                mixed += background + 0.5
+                writer.write(mixed.astype(np.uint8))
+
+
+def save_cutout(rgb, mask, save_path, background=None, budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """合成并保存抠图结果，background 为 (r, g, b) 时贴到纯色背景上
+
+    整幅结果超过内存预算的 PNG 按条带合成写出。
+    """
+    if save_path.lower().endswith(".png") and needs_strips(rgb, budget_mb):
+        save_composite_strips(rgb, mask, save_path, background, strip_rows(rgb.width, budget_mb))
+        return
+    no_bg = compose_rgba(rgb, mask)
+    if background is not None:
+        output = Image.new('RGB', no_bg.size, tuple(background))
+        output.paste(no_bg, (0, 0), no_bg)
+        no_bg = output
+    no_bg.save(save_path)
+
+
+def fit_background(background, size):
+    """背景为颜色时原样返回，为图片时按目标尺寸居中裁剪缩放"""
+    if isinstance(background, Image.Image):
+        return ImageOps.fit(background.convert('RGB'), size, Image.BILINEAR)
+    return background
+
+
+def load_variants(variants, output_dir):
+    """多背景批量处理：为每种背景建立子文件夹，背景图片只解码一次
+
+    variants 为 (名称, 颜色元组或背景图片路径) 列表，返回 (背景列表, 子文件夹列表)。
+    """
+    backgrounds = []
+    folders = []
+    for name, background in variants:
+        if isinstance(background, str):
+            background = Image.open(background)
+            background.load()
+        folder = os.path.join(output_dir, name)
+        os.makedirs(folder, exist_ok=True)
+        backgrounds.append(background)
+        folders.append(folder)
+    return backgrounds, folders
+
+
+def render_backgrounds(rgb, mask, backgrounds, save_paths, rows=256):
+    """用同一个掩码一次生成多种背景的结果，依次保存到 save_paths
+
+    backgrounds 中每项为 (r, g, b) 颜色或背景图片。掩码只放大一次，
+    每种背景按行条带做向量化混合：PNG 逐条写入文件，其他格式填入整幅 uint8 数组后保存。
+    """
+    width, height = rgb.size
+    alpha = Image.fromarray(mask).resize(rgb.size, Image.BILINEAR)
+    for background, path in zip(backgrounds, save_paths):
+        background = fit_background(background, rgb.size)
+        is_image = isinstance(background, Image.Image)
+        color = None if is_image else np.asarray(background, dtype=np.float32)
+        if path.lower().endswith(".png"):
+            writer, output = PngStripWriter(path, width, height, 'RGB'), None
+        else:
+            writer, output = None, np.empty((height, width, 3), dtype=np.uint8)
+        try:
+            for y0 in range(0, height, rows):
+                y1 = min(height, y0 + rows)
+                box = (0, y0, width, y1)
+                a = np.asarray(alpha.crop(box)).astype(np.float32)[..., np.newaxis]
+                a *= 1.0 / 255.0
+                bg = np.asarray(background.crop(box), dtype=np.float32) if is_image else color
+                # 背景 + (前景 - 背景) * a
+                mixed = np.asarray(rgb.crop(box)).astype(np.float32)
+                mixed -= bg
+                mixed *= a
+                mixed += bg
+                mixed += 0.5
+                if writer:
+                    writer.write(mixed.astype(np.uint8))
+                else:
+                    output[y0:y1] = mixed
+        except Exception:
+            if writer:
+                writer.abort()
+            raise
+        if writer:
+            writer.close()
+        else:
+            Image.fromarray(output).save(path)
+
+
+def dynamic_batch(session):
+    """模型输入的批维度是动态的（不是固定整数）时返回 True"""
+    dim = session.get_inputs()[0].shape[0]
+    return not (isinstance(dim, int) and dim > 0)
+
+
+class BatchTuner:
+    """按实测的单张推理耗时自动选择批大小
+
+    从 1 开始依次尝试更大的批，单张耗时不再明显下降时固定为最快的值。
+    会话的第一次推理包含初始化开销，未单独预热时不计入比较。
+    """
+
+    def __init__(self, enabled=True):
+        self.candidates = list(BATCH_CANDIDATES) if enabled else [1]
+        self.best = 1
+        self.settled = len(self.candidates) == 1
+        self._index = 0
+        self._best_cost = None
+        self._warmed = False
+
+    def next_size(self):
+        return self.best if self.settled else self.candidates[self._index]
+
+    def mark_warm(self):
+        """会话已经单独预热过，第一次推理也参与比较"""
+        self._warmed = True
+
+    def record(self, size, seconds):
+        """记录一次推理的批大小和耗时，批不满（剩余图片不足等）时不参与比较"""
+        if not self._warmed:
+            self._warmed = True
+            return
+        if self.settled or size != self.candidates[self._index]:
+            return
+        cost = seconds / size
+        if self._best_cost is None or cost < self._best_cost * 0.95:
+            self.best, self._best_cost = size, cost
+            self._index += 1
+            self.settled = self._index >= len(self.candidates)
+        else:
+            self.settled = True
+
+    def disable(self):
+        """模型实际不支持多张一批时退回逐张推理"""
+        self.candidates = [1]
+        self.best = 1
+        self.settled = True
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""批量抠图的多进程后端：文件列表分片交给多个工作进程，解码、合成、编码不再受 GIL 限制
+
+每个工作进程持有自己的 InferenceSession，推理线程数按总预算平分，避免线程数超过核心数。
+工作进程用 spawn 方式启动。spawn 默认会在子进程中重新导入主模块（main.py 会导入 PySide6），
+因此启动进程时临时换成空的主模块，子进程只导入本模块和 koutu_ops/koutu_session。
+打包后的程序由可执行文件自身启动子进程，仍会执行主脚本顶部的导入。
+"""
+import contextlib
+import multiprocessing
+import os
+import sys
+import types
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+
+from page.koutu_ops import (load_rgb, prepare_input, normalize_mask, dynamic_batch, save_cutout,
+                            load_variants, render_backgrounds, strip_rows, MODEL_SIZE, BATCH_PIXEL_BUDGET)
+from page.koutu_session import create_session, model_tag, int_setting
+from page.mask_cache import MaskCache, DEFAULT_CAPACITY
+
+SHARD_SIZE = 4  # 每个分片的图片数，分片越小进度越细、负载越均衡
+
+_worker = {}  # 工作进程内的会话、掩码缓存和背景，由 _init_worker 填充
+
+
+def worker_threads(processes, config):
+    """每个工作进程的推理线程数：推理线程数（未设置时为核心数）按进程数平分"""
+    budget = int_setting(config, "推理线程数") or os.cpu_count() or 1
+    return max(1, budget // processes)
+
+
+@contextlib.contextmanager
+def _slim_main():
+    """临时把 __main__ 换成空模块：spawn 记录的启动信息中没有主脚本路径，子进程不再导入界面模块"""
+    main_module = sys.modules["__main__"]
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main_module
+
+
+def _init_worker(model_path, config, threads, job):
+    config = dict(config)
+    config["推理线程数"] = str(threads)
+    config["并行算子线程数"] = "1"
+    session = create_session(model_path, config)
+    _worker["session"] = session
+    _worker["batched"] = dynamic_batch(session)
+    # 磁盘缓存以原子替换写入，多个进程可以共用同一目录
+    _worker["cache"] = MaskCache(model_tag(model_path), int_setting(config, "掩码缓存数量", DEFAULT_CAPACITY),
+                                 config.get("掩码缓存目录"))
+    if job["operation"] == "multi_background":
+        _worker["variants"] = load_variants(job["variants"], job["output_dir"])
+
+
+def _predict(rgbs):
+    """与 PhotoProcessor.predict_masks 相同：先查缓存，未命中的图片叠成一批推理"""
+    session = _worker["session"]
+    cache = _worker["cache"]
+    batch = np.empty((len(rgbs), 3, MODEL_SIZE, MODEL_SIZE), dtype=np.float32)
+    keys, masks, missing = [], [], []
+    for i, rgb in enumerate(rgbs):
+        prepare_input(rgb, batch[i])
+        keys.append(cache.key(batch[i]))
+        masks.append(cache.get(keys[i]))
+        if masks[i] is None:
+            missing.append(i)
+    if missing:
+        name = session.get_inputs()[0].name
+        inputs = batch[missing]
+        if _worker["batched"]:
+            outputs = session.run(None, {name: inputs})[0]
+        else:
+            outputs = [session.run(None, {name: x[np.newaxis]})[0][0] for x in inputs]
+        for j, i in enumerate(missing):
+            masks[i] = normalize_mask(outputs[j][0])
+            cache.put(keys[i], masks[i])
+    return masks
+
+
+def _save(job, path, rgb, mask):
+    filename = os.path.basename(path)
+    if job["operation"] == "multi_background":
+        backgrounds, folders = _worker["variants"]
+        render_backgrounds(rgb, mask, backgrounds, [os.path.join(folder, filename) for folder in folders],
+                           strip_rows(rgb.width, job["budget"]))
+    else:
+        save_cutout(rgb, mask, os.path.join(job["output_dir"], filename), job["color"], job["budget"])
+
+
+def _process_shard(paths, job):
+    """在工作进程中处理一个分片，返回 [(路径, 错误信息或 None)]"""
+    results = {}
+    loaded = []
+    pixels = 0
+    for path in paths:
+        try:
+            rgb = load_rgb(path)
+        except Exception as e:
+            results[path] = str(e)
+            continue
+        loaded.append((path, rgb))
+        pixels += rgb.width * rgb.height
+    chunks = [loaded] if _worker["batched"] and pixels < BATCH_PIXEL_BUDGET else [[item] for item in loaded]
+    for chunk in chunks:
+        try:
+            masks = _predict([rgb for _, rgb in chunk])
+        except Exception as e:
+            results.update((path, str(e)) for path, _ in chunk)
+            continue
+        for (path, rgb), mask in zip(chunk, masks):
+            try:
+                _save(job, path, rgb, mask)
+                results[path] = None
+            except Exception as e:
+                results[path] = str(e)
+    return [(path, results.get(path)) for path in paths]
+
+
+def run_in_processes(paths, job, model_path, config, processes, progress=None, stopped=None):
+    """把 paths 分片交给 processes 个工作进程处理，返回 {路径: 错误信息}
+
+    job 包含 operation、output_dir、color（更换背景颜色时）、variants（多背景时）和 budget（MB）。
+    progress(已完成数, 总数) 在主进程中按分片完成顺序回调；stopped() 返回 True 时取消尚未开始的分片。
+    """
+    progress = progress or (lambda done, total: None)
+    errors = {}
+    total = len(paths)
+    done = 0
+    shards = [paths[i:i + SHARD_SIZE] for i in range(0, total, SHARD_SIZE)]
+    threads = worker_threads(processes, config)
+    with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker,
+                             initargs=(model_path, config, threads, job)) as pool:
+        # 工作进程在 submit 时启动，全部提交完之前保持空的主模块
+        with _slim_main():
+            pending = {pool.submit(_process_shard, shard, job): shard for shard in shards}
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                shard = pending.pop(future)
+                if future.cancelled():
+                    errors.update((path, "已取消") for path in shard)
+                    continue
+                try:
+                    results = future.result()
+                except Exception as e:
+                    results = [(path, str(e)) for path in shard]
+                errors.update((path, error) for path, error in results if error is not None)
+                done += len(shard)
+                progress(done, total)
+            if stopped and stopped():
+                for future in pending:
+                    future.cancel()
+    return errors
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""抠图模型的 onnxruntime 会话创建：读取 config/koutu_settings.ini 中的模型、线程、图优化和内存配置，
+并把优化后的模型缓存在原模型旁边，之后启动时跳过图优化"""
+import os
+
+from core.command import read_config
+
+KOUTU_SETTINGS_FILE = os.path.join("config", "koutu_settings.ini")
+
+# 可选的模型（配置项“模型”）与模型文件名，量化模型由 tools/quantize_koutu.py 生成
+MODEL_VARIANTS = {
+    "u2netp": "u2netp.onnx",                          # 默认，float32
+    "u2netp-int8": "u2netp.int8.onnx",                # 动态 INT8 量化
+    "u2netp-int8-static": "u2netp.int8-static.onnx",  # 静态 INT8 量化（QDQ，需校准图片）
+    "u2netp-fp16": "u2netp.fp16.onnx",                # FP16 权重，输入输出仍为 float32
+    "u2net": "u2net.onnx",                            # 完整 U-2-Net，速度慢但边缘更准确
+}
+DEFAULT_MODEL = "u2netp"
+# 一键清晰 CPU 后端（清晰化后端=onnx）默认使用的 Real-ESRGAN ONNX 模型
+DEFAULT_SR_MODEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "realesrgan-x4plus.onnx")
+
+# 配置值与 onnxruntime 图优化级别名称的对应关系
+GRAPH_OPTIMIZATION_LEVELS = {
+    "禁用": "ORT_DISABLE_ALL",
+    "基础": "ORT_ENABLE_BASIC",
+    "扩展": "ORT_ENABLE_EXTENDED",
+    "全部": "ORT_ENABLE_ALL",
+}
+DEFAULT_OPTIMIZATION = "全部"
+
+
+def int_setting(config, key, default=0):
+    """读取非负整数配置，未配置或非法时返回 default"""
+    try:
+        return max(0, int(config.get(key, "")))
+    except ValueError:
+        return default
+
+
+def optimization_name(config):
+    level = config.get("图优化级别", DEFAULT_OPTIMIZATION)
+    return level if level in GRAPH_OPTIMIZATION_LEVELS else DEFAULT_OPTIMIZATION
+
+
+def session_options(config):
+    """根据配置生成 SessionOptions，未配置的项保持 onnxruntime 默认值"""
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    intra_threads = int_setting(config, "推理线程数")
+    if intra_threads:
+        options.intra_op_num_threads = intra_threads
+    inter_threads = int_setting(config, "并行算子线程数")
+    if inter_threads:
+        options.inter_op_num_threads = inter_threads
+        if inter_threads > 1:
+            # 算子间线程只在并行执行模式下生效
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+    options.graph_optimization_level = getattr(
+        ort.GraphOptimizationLevel, GRAPH_OPTIMIZATION_LEVELS[optimization_name(config)]
+    )
+    if config.get("内存池") == "否":
+        options.enable_cpu_mem_arena = False
+        options.enable_mem_pattern = False
+    if config.get("线程自旋") == "否":
+        # 空闲的推理线程不再忙等，与 ffmpeg 等进程共用机器时不抢占 CPU
+        options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        options.add_session_config_entry("session.inter_op.allow_spinning", "0")
+    return options
+
+
+def optimized_model_path(model_path, config):
+    """优化后模型的缓存路径，包含 onnxruntime 版本和优化级别，版本或级别变化后自动重新生成"""
+    import onnxruntime as ort
+    level = GRAPH_OPTIMIZATION_LEVELS[optimization_name(config)].rsplit("_", 1)[-1].lower()
+    base = os.path.splitext(model_path)[0]
+    return f"{base}.ort-{ort.__version__}-{level}.onnx"
+
+
+def _cache_is_current(cached_path, model_path):
+    try:
+        return os.path.getmtime(cached_path) >= os.path.getmtime(model_path)
+    except OSError:
+        return False
+
+
+def model_file(model_dir, config):
+    """根据配置项“模型”返回模型文件路径，文件不存在时抛出 FileNotFoundError"""
+    variant = config.get("模型", DEFAULT_MODEL)
+    if variant not in MODEL_VARIANTS:
+        raise ValueError(f"未知的抠图模型：{variant}（可选 {'、'.join(MODEL_VARIANTS)}）")
+    path = os.path.join(model_dir, MODEL_VARIANTS[variant])
+    if not os.path.exists(path):
+        hint = "，请先运行 tools/quantize_koutu.py 生成" if variant.startswith("u2netp-") else ""
+        raise FileNotFoundError(f"找不到抠图模型文件 {path}{hint}")
+    return path
+
+
+def model_tag(model_path):
+    """模型文件的标识（文件名、大小、修改时间），换了模型后掩码缓存不会误用"""
+    st = os.stat(model_path)
+    return f"{os.path.basename(model_path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def create_sr_session(config=None):
+    """创建一键清晰 CPU 后端的会话，模型由配置项“清晰化模型”指定"""
+    if config is None:
+        config = read_config(KOUTU_SETTINGS_FILE)
+    path = config.get("清晰化模型", DEFAULT_SR_MODEL)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"找不到清晰化模型文件 {path}")
+    return create_session(path, config)
+
+
+def create_session(model_path, config=None):
+    """创建 CPU 推理会话
+
+    已有未过期的优化模型缓存时直接加载并关闭图优化；否则按配置优化原模型，
+    目录可写时顺便把优化结果保存下来。缓存加载失败时删除缓存并退回原模型。
+    """
+    import onnxruntime as ort
+    if config is None:
+        config = read_config(KOUTU_SETTINGS_FILE)
+    providers = ['CPUExecutionProvider']
+    use_cache = config.get("缓存优化模型") != "否" and optimization_name(config) != "禁用"
+    cached_path = optimized_model_path(model_path, config)
+
+    if use_cache and _cache_is_current(cached_path, model_path):
+        options = session_options(config)
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        try:
+            return ort.InferenceSession(cached_path, sess_options=options, providers=providers)
+        except Exception:
+            try:
+                os.remove(cached_path)
+            except OSError:
+                pass
+
+    options = session_options(config)
+    if use_cache and os.access(os.path.dirname(os.path.abspath(model_path)), os.W_OK):
+        options.optimized_model_filepath = cached_path
+    return ort.InferenceSession(model_path, sess_options=options, providers=providers)
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""输出窗口的日志缓冲：定时批量刷新，限制保留行数"""
+from collections import deque
+from PySide6.QtCore import QObject, QTimer
+
+
+class LogSink(QObject):
+    """把零散的日志片段攒在环形缓冲区里，按固定频率一次性写入文本框"""
+
+    def __init__(self, text_edit, max_lines=2000, interval_ms=100, parent=None):
+        super().__init__(parent)
+        self.text_edit = text_edit
+        # 文档本身也只保留最近 max_lines 行，旧内容自动丢弃
+        self.text_edit.document().setMaximumBlockCount(max_lines)
+        self.pending = deque(maxlen=max_lines)  # 待刷新的行，超出时丢弃最旧的
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval_ms)  # 默认 10 Hz
+        self.timer.timeout.connect(self.flush)
+        self.timer.start()
+
+    def append(self, text):
+        self.pending.extend(text.splitlines() or [""])
+
+    def flush(self):
+        if not self.pending:
+            return
+        lines = "\n".join(self.pending)
+        self.pending.clear()
+        self.text_edit.append(lines)
+
+    def stop(self):
+        self.timer.stop()
+        self.pending.clear()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""抠图掩码缓存：以模型输入内容的哈希为键，内存 LRU，可选磁盘层"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_CAPACITY = 256  # 内存中保留的掩码数（每个 320x320 约 100 KB）
+
+
+class MaskCache:
+    """同一张图片（即使文件名不同，或是已经抠过图的 PNG）重复去除、更换背景时直接取出掩码
+
+    键由模型标识和 320x320 的模型输入张量计算，输入相同则掩码必然相同。
+    disk_dir 不为空时掩码同时保存为 <键>.npy，程序重启后仍可命中。可在多个线程中使用。
+    """
+
+    def __init__(self, model_tag, capacity=DEFAULT_CAPACITY, disk_dir=None):
+        self.model_tag = model_tag.encode('utf-8')
+        self.capacity = capacity
+        self.disk_dir = disk_dir
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def key(self, model_input):
+        digest = hashlib.blake2b(self.model_tag, digest_size=16)
+        digest.update(memoryview(np.ascontiguousarray(model_input)).cast('B'))
+        return digest.hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key + ".npy")
+
+    def get(self, key):
+        with self._lock:
+            mask = self._items.get(key)
+            if mask is not None:
+                self._items.move_to_end(key)
+                return mask
+        if not self.disk_dir:
+            return None
+        try:
+            mask = np.load(self._disk_path(key))
+        except (OSError, ValueError):
+            return None
+        self._remember(key, mask)
+        return mask
+
+    def put(self, key, mask):
+        self._remember(key, mask)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                with open(temp_path, 'wb') as f:
+                    np.save(f, mask)
+                os.replace(temp_path, path)
+            except OSError:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+    def _remember(self, key, mask):
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._items[key] = mask
+            self._items.move_to_end(key)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
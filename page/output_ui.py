@@ -15,8 +15,8 @@ from PySide6.QtGui import (QBrush, QColor, QConicalGradient, QCursor,
     QFont, QFontDatabase, QGradient, QIcon,
     QImage, QKeySequence, QLinearGradient, QPainter,
     QPalette, QPixmap, QRadialGradient, QTransform)
-from PySide6.QtWidgets import (QApplication, QPushButton, QSizePolicy, QTextEdit,
-    QWidget)
+from PySide6.QtWidgets import (QApplication, QCheckBox, QProgressBar, QPushButton,
+    QSizePolicy, QTextEdit, QWidget)
 import icon_rc
 
 class Ui_Form(object):
@@ -29,7 +29,14 @@ class Ui_Form(object):
         Form.setStyleSheet(u"")
         self.textEdit = QTextEdit(Form)
         self.textEdit.setObjectName(u"textEdit")
-        self.textEdit.setGeometry(QRect(10, 10, 531, 371))
+        self.textEdit.setGeometry(QRect(10, 10, 531, 331))
+        self.progressBar = QProgressBar(Form)
+        self.progressBar.setObjectName(u"progressBar")
+        self.progressBar.setGeometry(QRect(10, 350, 531, 31))
+        self.progressBar.setValue(0)
+        self.checkBox = QCheckBox(Form)
+        self.checkBox.setObjectName(u"checkBox")
+        self.checkBox.setGeometry(QRect(10, 390, 161, 31))
         self.pushButton = QPushButton(Form)
         self.pushButton.setObjectName(u"pushButton")
         self.pushButton.setGeometry(QRect(440, 390, 81, 31))
@@ -45,5 +52,6 @@ class Ui_Form(object):
     def retranslateUi(self, Form):
         Form.setWindowTitle(QCoreApplication.translate("Form", u"\u6267\u884c\u7a0b\u5e8f", None))
         self.pushButton.setText(QCoreApplication.translate("Form", u"\u7ec8\u6b62", None))
+        self.checkBox.setText(QCoreApplication.translate("Form", u"\u663e\u793a\u8be6\u7ec6\u65e5\u5fd7", None))
     # retranslateUi
 
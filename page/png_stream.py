@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""按行条带写 PNG，超大图片不需要在内存中拼出整幅结果"""
+import os
+import struct
+import zlib
+
+import numpy as np
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+COLOR_TYPES = {"L": (0, 1), "RGB": (2, 3), "RGBA": (6, 4)}  # 模式 -> (PNG 颜色类型, 通道数)
+IDAT_SIZE = 1 << 20  # 压缩数据攒够 1 MiB 写一个 IDAT 块
+
+
+class PngStripWriter:
+    """逐条带写入 8 位 PNG，每行使用 Sub 过滤后送入 zlib，内存只与条带大小有关
+
+    用法：
+        with PngStripWriter(path, width, height, "RGBA") as writer:
+            writer.write(rows)  # rows 为 (行数, width, 通道数) 的 uint8 数组，按从上到下的顺序
+    写入的总行数与 height 不一致或中途出错时删除不完整的文件。
+    """
+
+    def __init__(self, path, width, height, mode, compress_level=6):
+        if mode not in COLOR_TYPES:
+            raise ValueError(f"不支持的 PNG 模式：{mode}")
+        color_type, self.channels = COLOR_TYPES[mode]
+        self.path = path
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compress_level)
+        self._pending = bytearray()
+        self._file = open(path, 'wb')
+        self._file.write(PNG_SIGNATURE)
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def _chunk(self, tag, data):
+        self._file.write(struct.pack('>I', len(data)))
+        self._file.write(tag)
+        self._file.write(data)
+        self._file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(tag)) & 0xffffffff))
+
+    def _flush_pending(self, force=False):
+        if self._pending and (force or len(self._pending) >= IDAT_SIZE):
+            self._chunk(b'IDAT', bytes(self._pending))
+            self._pending.clear()
+
+    def write(self, rows):
+        rows = np.asarray(rows, dtype=np.uint8)
+        count = rows.shape[0]
+        flat = rows.reshape(count, self.width * self.channels)
+        bpp = self.channels
+        # Sub 过滤：每个字节减去左边一个像素的同一通道（按 256 取模），第一个字节是过滤类型
+        filtered = np.empty((count, flat.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 1
+        filtered[:, 1:1 + bpp] = flat[:, :bpp]
+        np.subtract(flat[:, bpp:], flat[:, :-bpp], out=filtered[:, 1 + bpp:])
+        self._pending += self._compressor.compress(memoryview(filtered).cast('B'))
+        self._flush_pending()
+        self.rows_written += count
+
+    def close(self):
+        try:
+            if self.rows_written != self.height:
+                raise RuntimeError(f"PNG 行数不完整：写入 {self.rows_written} 行，应为 {self.height} 行")
+            self._pending += self._compressor.flush()
+            self._flush_pending(force=True)
+            self._chunk(b'IEND', b'')
+        except Exception:
+            self.abort()
+            raise
+        self._file.close()
+
+    def abort(self):
+        """放弃写入并删除不完整的文件"""
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
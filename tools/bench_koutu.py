@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""抠图后处理基准：比较旧的合成方式与 page.koutu_ops 的耗时和峰值内存
+
+用法：python tools/bench_koutu.py [--megapixels 24] [--repeat 3]
+每种方式在独立子进程中运行，以便分别统计峰值 RSS。不需要模型文件。
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def legacy_compose(img, pred):
+    """修改前 remove_bg_onnx 的后处理流程"""
+    import numpy as np
+    from PIL import Image
+    img = img.convert('RGB')
+    pred = (pred - pred.min()) / (pred.max() - pred.min() + 1e-8)
+    mask = (pred * 255).astype(np.uint8)
+    mask = Image.fromarray(mask).resize(img.size, Image.BILINEAR)
+    img_rgba = img.convert("RGBA")
+    mask_np = np.array(mask)
+    img_np = np.array(img_rgba)
+    img_np[..., 3] = mask_np
+    return Image.fromarray(img_np)
+
+
+def current_compose(img, pred):
+    from page.koutu_ops import to_rgb, normalize_mask, compose_rgba
+    return compose_rgba(to_rgb(img), normalize_mask(pred))
+
+
+def run_one(method, megapixels, repeat):
+    import numpy as np
+    from PIL import Image
+    width = int((megapixels * 1e6 * 1.5) ** 0.5)
+    height = int(megapixels * 1e6 / width)
+    img = Image.effect_noise((width, height), 64).convert('RGB')
+    pred = np.random.rand(320, 320).astype(np.float32)
+    compose = legacy_compose if method == "legacy" else current_compose
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = compose(img, pred.copy())
+        timings.append(time.perf_counter() - start)
+        del result
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{method:8s} {width}x{height}  最快 {min(timings) * 1000:.0f} ms  "
+          f"后处理额外峰值内存 {(peak_rss - base_rss) / 1024:.0f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--megapixels", type=float, default=24)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--method", choices=["legacy", "current"])
+    args = parser.parse_args()
+    if args.method:
+        run_one(args.method, args.megapixels, args.repeat)
+        return
+    for method in ("legacy", "current"):
+        subprocess.run([sys.executable, __file__, "--method", method,
+                        "--megapixels", str(args.megapixels), "--repeat", str(args.repeat)], check=True)
+
+
+if __name__ == "__main__":
+    main()
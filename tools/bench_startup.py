@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""启动耗时基准：多次冷启动 main.py，统计到主窗口显示为止的耗时
+
+用法：python tools/bench_startup.py [--runs 5] [--max-ms 1500] [--imports]
+main.py 在 OFC_STARTUP_REPORT=exit 时显示主窗口后立即退出并输出耗时。
+--max-ms 设置中位数上限，超出时返回非零退出码，可用于发现启动变慢；
+--imports 额外列出导入最慢的模块（python -X importtime）。需要图形环境（或 xvfb-run）。
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+REPORT_PATTERN = re.compile(r"导入模块 (\d+) ms，首个窗口 (\d+) ms")
+IMPORT_PATTERN = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)")
+
+
+def run_once(extra_args=()):
+    env = dict(os.environ, OFC_STARTUP_REPORT="exit")
+    proc = subprocess.run([sys.executable, *extra_args, "main.py"], cwd=ROOT, env=env,
+                          capture_output=True, text=True, errors="replace", timeout=120)
+    match = REPORT_PATTERN.search(proc.stderr)
+    if not match:
+        raise RuntimeError(f"main.py 没有输出启动耗时（退出码 {proc.returncode}）:\n{proc.stderr[-2000:]}")
+    return int(match.group(1)), int(match.group(2)), proc.stderr
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=int, default=0, help="首个窗口耗时中位数的上限（毫秒）")
+    parser.add_argument("--imports", action="store_true", help="列出导入最慢的 15 个顶层模块")
+    args = parser.parse_args()
+
+    imports, windows = [], []
+    for _ in range(max(1, args.runs)):
+        import_ms, window_ms, _ = run_once()
+        imports.append(import_ms)
+        windows.append(window_ms)
+    median = statistics.median(windows)
+    print(f"{len(windows)} 次启动：导入模块中位数 {statistics.median(imports):.0f} ms，"
+          f"首个窗口中位数 {median:.0f} ms（最快 {min(windows)} ms，最慢 {max(windows)} ms）")
+
+    if args.imports:
+        _, _, stderr = run_once(["-X", "importtime"])
+        # 只统计顶层包（缩进最少的行）的累计耗时
+        totals = {}
+        for line in stderr.splitlines():
+            match = IMPORT_PATTERN.search(line)
+            if match and not match.group(2).startswith("."):
+                name = match.group(2).split(".")[0]
+                totals[name] = max(totals.get(name, 0), int(match.group(1)))
+        for name, micros in sorted(totals.items(), key=lambda item: -item[1])[:15]:
+            print(f"  {micros / 1000:8.1f} ms  {name}")
+
+    if args.max_ms and median > args.max_ms:
+        print(f"首个窗口耗时 {median:.0f} ms 超过上限 {args.max_ms} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
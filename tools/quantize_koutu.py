@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""生成抠图模型的量化版本，并在本地样例图片上与 float32 模型比较掩码 IoU
+
+用法：python tools/quantize_koutu.py --samples 样例图片目录 [--variants int8,int8-static,fp16] [--min-iou 0.95]
+生成的模型保存在原模型旁边（如 page/u2netp.int8.onnx），在 config/koutu_settings.ini 中
+设置 模型=u2netp-int8 即可使用。平均 IoU 低于 --min-iou 的模型会被删除。
+需要 onnx；fp16 另外需要 onnxconverter-common。
+"""
+import argparse
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from page.koutu_ops import load_rgb, prepare_input, normalize_mask
+from page.koutu_session import MODEL_VARIANTS
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "page")
+IMAGE_PATTERNS = ("*.png", "*.jpg", "*.jpeg", "*.bmp", "*.webp", "*.tiff")
+MASK_THRESHOLD = 128  # 掩码二值化阈值，计算 IoU 用
+CALIBRATION_IMAGES = 64  # 静态量化最多使用的校准图片数
+
+
+def find_samples(directory):
+    files = []
+    for pattern in IMAGE_PATTERNS:
+        files.extend(glob.glob(os.path.join(directory, pattern)))
+    return sorted(files)
+
+
+def load_inputs(paths):
+    """预处理样例图片为 [1, 3, 320, 320] 的模型输入"""
+    return [prepare_input(load_rgb(path))[np.newaxis] for path in paths]
+
+
+class SampleReader:
+    """静态量化的校准数据，实现 onnxruntime 的 CalibrationDataReader 接口"""
+
+    def __init__(self, input_name, inputs):
+        self._items = iter([{input_name: x} for x in inputs])
+
+    def get_next(self):
+        return next(self._items, None)
+
+    def rewind(self):
+        pass
+
+
+def preprocess(source, work_dir):
+    """量化前做形状推断和图优化，失败时直接使用原模型"""
+    from onnxruntime.quantization import quant_pre_process
+    target = os.path.join(work_dir, "preprocessed.onnx")
+    try:
+        quant_pre_process(source, target, skip_symbolic_shape=True)
+        return target
+    except Exception as e:
+        print(f"量化预处理失败，使用原模型：{e}")
+        return source
+
+
+def quantize_int8(source, target):
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantize_dynamic(source, target, weight_type=QuantType.QUInt8)
+
+
+def quantize_int8_static(source, target, input_name, inputs):
+    from onnxruntime.quantization import quantize_static, QuantFormat, QuantType
+    quantize_static(source, target, SampleReader(input_name, inputs[:CALIBRATION_IMAGES]),
+                    quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                    per_channel=True)
+
+
+def convert_fp16(source, target):
+    import onnx
+    from onnxconverter_common import float16
+    model = float16.convert_float_to_float16(onnx.load(source), keep_io_types=True)
+    onnx.save(model, target)
+
+
+def predict(session, inputs):
+    """返回二值化掩码列表和单张平均耗时（毫秒）"""
+    name = session.get_inputs()[0].name
+    session.run(None, {name: inputs[0]})  # 预热
+    masks = []
+    start = time.perf_counter()
+    for x in inputs:
+        mask = normalize_mask(session.run(None, {name: x})[0][0][0])
+        masks.append(mask >= MASK_THRESHOLD)
+    return masks, (time.perf_counter() - start) * 1000 / len(inputs)
+
+
+def iou(a, b):
+    union = np.logical_or(a, b).sum()
+    return 1.0 if union == 0 else np.logical_and(a, b).sum() / union
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", required=True, help="用于校准和比较的样例图片目录")
+    parser.add_argument("--model", default=os.path.join(MODEL_DIR, MODEL_VARIANTS["u2netp"]),
+                        help="float32 模型，默认 page/u2netp.onnx")
+    parser.add_argument("--variants", default="int8,int8-static",
+                        help="要生成的版本，逗号分隔：int8、int8-static、fp16")
+    parser.add_argument("--min-iou", type=float, default=0.95, help="平均 IoU 低于该值时删除生成的模型")
+    args = parser.parse_args()
+
+    import onnxruntime as ort
+    samples = find_samples(args.samples)
+    if not samples:
+        print("样例目录中没有图片", file=sys.stderr)
+        return 2
+    inputs = load_inputs(samples)
+    providers = ['CPUExecutionProvider']
+    reference = ort.InferenceSession(args.model, providers=providers)
+    input_name = reference.get_inputs()[0].name
+    reference_masks, reference_ms = predict(reference, inputs)
+    print(f"样例 {len(samples)} 张，float32：{reference_ms:.1f} ms/张，"
+          f"{os.path.getsize(args.model) / 2 ** 20:.1f} MiB")
+
+    base = os.path.splitext(args.model)[0]
+    work_dir = tempfile.mkdtemp(prefix="ofc-quantize-")
+    builders = {
+        "int8": lambda target: quantize_int8(preprocess(args.model, work_dir), target),
+        "int8-static": lambda target: quantize_int8_static(preprocess(args.model, work_dir), target,
+                                                           input_name, inputs),
+        "fp16": lambda target: convert_fp16(args.model, target),
+    }
+    failed = False
+    for variant in [v.strip() for v in args.variants.split(",") if v.strip()]:
+        if variant not in builders:
+            print(f"{variant}: 未知的版本，可选 {'、'.join(builders)}", file=sys.stderr)
+            failed = True
+            continue
+        target = f"{base}.{variant}.onnx"
+        try:
+            builders[variant](target)
+        except ImportError as e:
+            print(f"{variant}: 跳过，缺少依赖（{e.name}）")
+            continue
+        session = ort.InferenceSession(target, providers=providers)
+        masks, ms = predict(session, inputs)
+        scores = [iou(a, b) for a, b in zip(reference_masks, masks)]
+        mean_iou = float(np.mean(scores))
+        passed = mean_iou >= args.min_iou
+        print(f"{variant}: {ms:.1f} ms/张（{reference_ms / ms:.2f}x），"
+              f"{os.path.getsize(target) / 2 ** 20:.1f} MiB，"
+              f"IoU 平均 {mean_iou:.4f}（与 float32 相差 {1 - mean_iou:.4f}），最低 {min(scores):.4f}"
+              + ("" if passed else f"，低于 {args.min_iou}，已删除"))
+        if not passed:
+            del session
+            os.remove(target)
+            failed = True
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())